@@ -4,9 +4,13 @@ Stellt Status-Informationen bereit und koordiniert Monitoring
 """
 
 import asyncio
+import copy
+import io
+import json
 import logging
+import weakref
 from contextlib import asynccontextmanager
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 import os
 
 import yaml
@@ -14,11 +18,26 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, FileResponse
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timezone
 
 from monitor import MonitoringEngine
 from notifications import TeamsNotifier
 
+# libyaml-Variante bevorzugen, falls verfügbar
+try:
+    from yaml import CSafeLoader as _Loader, CSafeDumper as _Dumper
+except ImportError:
+    from yaml import SafeLoader as _Loader, SafeDumper as _Dumper
+
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
 # Logging konfigurieren
 logging.basicConfig(
     level=logging.INFO,
@@ -31,16 +50,39 @@ monitoring_engine: MonitoringEngine = None
 teams_notifier: TeamsNotifier = None
 config: Dict[str, Any] = {}
 userdata: Dict[str, Any] = {}
-active_websockets: List[WebSocket] = []
+# Schwache Referenzen - beendete Verbindungen verschwinden automatisch
+active_websockets: weakref.WeakSet = weakref.WeakSet()
+# Wird bei jeder Änderung der globalen Einstellungen erhöht
+settings_gen = 0
+# Wiederverwendete Notifier pro Webhook-URL
+notifiers: Dict[str, TeamsNotifier] = {}
+# Laufende Hintergrund-Tasks, die nicht mehr benötigte Notifier schließen
+_notifier_close_tasks: Set[asyncio.Task] = set()
+# Name -> Geräte-Konfiguration (dieselben Objekte wie in userdata["devices"])
+device_configs: Dict[str, Dict[str, Any]] = {}
+# id() gelöschter Geräte-Konfigurationen, werden erst beim Speichern aus userdata["devices"] gefiltert
+_deleted_devices: Set[int] = set()
+# Fingerprint des zuletzt gebroadcasteten Status (None = noch keiner gesendet)
+last_broadcast_hash: Optional[int] = None
+# Weckt den Monitoring Loop für einen sofortigen Check-Zyklus (manueller Test),
+# wird wie die Userdata-Queue erst in lifespan angelegt
+force_check: Optional[asyncio.Event] = None
+# Snapshots der Userdata für den Hintergrund-Writer (None beendet den Writer),
+# wird in lifespan angelegt, damit die Queue an den laufenden Event-Loop gebunden ist
+_userdata_queue: Optional[asyncio.Queue] = None
+
+# Batch-Größe für gleichzeitige WebSocket-Sends und Timeout pro Client
+BROADCAST_BATCH = 50
+BROADCAST_TIMEOUT = 5.0
 
 
 def load_config() -> Dict[str, Any]:
     """Lädt die Basis-Konfiguration aus config.yaml"""
     try:
         with open("config.yaml", "r", encoding="utf-8") as f:
-            return yaml.safe_load(f) or {}
+            return yaml.load(f, Loader=_Loader) or {}
     except Exception as e:
-        logger.error(f"Fehler beim Laden der Konfiguration: {e}")
+        logger.error("Fehler beim Laden der Konfiguration: %s", e)
         return {}
 
 def load_userdata() -> Dict[str, Any]:
@@ -55,7 +97,7 @@ def load_userdata() -> Dict[str, Any]:
     if os.path.exists(userdata_path):
         try:
             with open(userdata_path, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f) or {}
+                data = yaml.load(f, Loader=_Loader) or {}
                 # Wenn wir userdata haben, brauchen wir nur sicherstellen, dass die keys existieren
                 if "devices" not in data:
                     data["devices"] = []
@@ -75,7 +117,7 @@ def load_userdata() -> Dict[str, Any]:
                             del device["use_global_webhook"]
                     save_userdata(data)
         except Exception as e:
-            logger.error(f"Fehler beim Laden der Userdata: {e}")
+            logger.error("Fehler beim Laden der Userdata: %s", e)
     else:
         # Migration from old config
         logger.info("Migriere Benutzerdaten aus config.yaml nach data/userdata.yaml...")
@@ -104,48 +146,140 @@ def load_userdata() -> Dict[str, Any]:
 def save_config(new_config: Dict[str, Any]):
     """Speichert die Basis-Konfiguration in config.yaml"""
     try:
+        # Erst in den Speicher rendern, dann mit einem write() schreiben
+        buf = io.StringIO()
+        yaml.dump(new_config, buf, Dumper=_Dumper, default_flow_style=False, sort_keys=False, allow_unicode=True)
         with open("config.yaml", "w", encoding="utf-8") as f:
-            yaml.dump(new_config, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+            f.write(buf.getvalue())
     except Exception as e:
-        logger.error(f"Fehler beim Speichern der Konfiguration: {e}")
+        logger.error("Fehler beim Speichern der Konfiguration: %s", e)
         raise
 
 def save_userdata(new_data: Dict[str, Any]):
     """Speichert die Benutzerdaten in data/userdata.yaml"""
     os.makedirs("data", exist_ok=True)
     try:
+        buf = io.StringIO()
+        yaml.dump(new_data, buf, Dumper=_Dumper, default_flow_style=False, sort_keys=False, allow_unicode=True)
         with open("data/userdata.yaml", "w", encoding="utf-8") as f:
-            yaml.dump(new_data, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+            f.write(buf.getvalue())
     except Exception as e:
-        logger.error(f"Fehler beim Speichern der Userdata: {e}")
+        logger.error("Fehler beim Speichern der Userdata: %s", e)
         raise
 
+def queue_userdata_save():
+    """Übergibt einen Snapshot der Userdata an den Hintergrund-Writer"""
+    if _deleted_devices:
+        userdata["devices"] = [d for d in userdata["devices"] if id(d) not in _deleted_devices]
+        _deleted_devices.clear()
+    _userdata_queue.put_nowait(copy.deepcopy(userdata))
+
+async def userdata_writer():
+    """Schreibt Userdata im Hintergrund - Bursts werden zur neuesten Version zusammengefasst"""
+    while True:
+        items = [await _userdata_queue.get()]
+        while not _userdata_queue.empty():
+            items.append(_userdata_queue.get_nowait())
+        
+        snapshots = [item for item in items if item is not None]
+        if snapshots:
+            try:
+                await asyncio.to_thread(save_userdata, snapshots[-1])
+            except Exception:
+                pass  # Bereits in save_userdata geloggt
+        
+        if len(snapshots) != len(items):
+            return
+
+def get_notifier(url: str) -> TeamsNotifier:
+    """Gibt den Notifier für eine Webhook-URL zurück (wird bei Bedarf angelegt)"""
+    notifier = notifiers.get(url)
+    if notifier is None:
+        notifier = notifiers[url] = TeamsNotifier(url)
+    return notifier
+
+async def _close_notifiers(dropped: List[TeamsNotifier]):
+    """Schließt Notifier (inkl. Versand ausstehender Alerts) parallel"""
+    results = await asyncio.gather(*(n.close() for n in dropped), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("Fehler beim Schließen eines Notifiers: %s", result)
+
+def _prune_notifiers(global_urls: Set[str]):
+    """Entfernt Notifier für URLs, die weder global noch von einem Gerät genutzt werden
+    
+    Das Schließen (Flush ausstehender Alerts) läuft im Hintergrund, damit der
+    Monitoring Loop nicht auf den Webhook wartet.
+    """
+    global notifiers
+    used_urls = global_urls | {d["webhook_url"] for d in device_configs.values() if d.get("webhook_url")}
+    dropped = [n for url, n in notifiers.items() if url not in used_urls]
+    if not dropped:
+        return
+    notifiers = {url: n for url, n in notifiers.items() if url in used_urls}
+    task = asyncio.create_task(_close_notifiers(dropped))
+    _notifier_close_tasks.add(task)
+    task.add_done_callback(_notifier_close_tasks.discard)
+
+def _status_fingerprint(results: List[Dict[str, Any]]) -> int:
+    """Hash über alle im Frontend sichtbaren Felder (ohne Zeitstempel und Antwortzeiten)"""
+    return hash(tuple(
+        (
+            r["name"], r["status"], r["notifications_enabled"], r["webhook_url"],
+            tuple(r["global_webhooks"]),
+            tuple(
+                (c["type"], c["status"], c["error"], c.get("target"), c.get("host"), c.get("port"))
+                for c in r["checks"]
+            )
+        )
+        for r in results
+    ))
+
 async def monitoring_loop():
     """Haupt-Monitoring-Loop - läuft kontinuierlich im Hintergrund"""
-    global monitoring_engine, teams_notifier, config
+    global monitoring_engine, teams_notifier, config, last_broadcast_hash
     
     check_interval = config.get("monitoring", {}).get("check_interval", 30)
     failure_threshold = config.get("monitoring", {}).get("failure_threshold", 2)
     
-    logger.info(f"Monitoring Loop gestartet (Intervall: {check_interval}s)")
+    logger.info("Monitoring Loop gestartet (Intervall: %ss)", check_interval)
+    
+    # Alias -> Notifier der globalen Webhooks, nur bei Einstellungsänderung neu aufgebaut
+    global_notifiers: Dict[str, TeamsNotifier] = {}
+    seen_settings_gen = -1
+    loop = asyncio.get_running_loop()
     
     while True:
+        # Nächsten Tick vorab festlegen, damit die Check-Dauer den Takt nicht verschiebt
+        next_tick = loop.time() + check_interval
+        
+        # Ein Zeitstempel pro Zyklus für Checks und Broadcast
+        tick_time = datetime.now(timezone.utc)
+        
         try:
+            if seen_settings_gen != settings_gen:
+                # Notifier nur für noch genutzte URLs behalten (Dedup- und Circuit-Breaker-Status bleibt erhalten)
+                global_urls = {w["url"] for w in userdata.get("global_webhooks", []) if w.get("url")}
+                _prune_notifiers(global_urls)
+                global_notifiers = {
+                    w["alias"]: get_notifier(w["url"])
+                    for w in userdata.get("global_webhooks", []) if w.get("url")
+                }
+                seen_settings_gen = settings_gen
+            
             # Broadcast start event
             if active_websockets:
-                checking_started_data = {"type": "checking_started"}
-                disconnected_during_start_broadcast = []
-                for ws in active_websockets:
-                    try:
-                        await ws.send_json(checking_started_data)
-                    except Exception:
-                        disconnected_during_start_broadcast.append(ws)
-                
-                for ws in disconnected_during_start_broadcast:
-                    active_websockets.remove(ws)
+                await _fanout({"type": "checking_started"})
 
             # Alle Geräte prüfen
-            results = await monitoring_engine.check_all_devices()
+            devices_gen = monitoring_engine.devices_gen
+            results = await monitoring_engine.check_all_devices(now=tick_time)
+            
+            # Für /api/status merken - außer die Geräteliste wurde währenddessen geändert
+            # oder der Zyklus hat nicht für alle Geräte Ergebnisse geliefert
+            if devices_gen == monitoring_engine.devices_gen and len(results) == len(monitoring_engine.devices):
+                monitoring_engine.latest_results = results
+                monitoring_engine.latest_tick_time = tick_time.isoformat()
             
             # Ergebnisse verarbeiten und Benachrichtigungen senden
             for result in results:
@@ -158,7 +292,7 @@ async def monitoring_loop():
                 
                 # Benachrichtigung bei Status-Änderung
                 if current_status != previous_status:
-                    logger.info(f"Status-Änderung erkannt für {device_name}: {previous_status} -> {current_status} (Failures: {consecutive_failures}/{failure_threshold})")
+                    logger.info("Status-Änderung erkannt für %s: %s -> %s (Failures: %s/%s)", device_name, previous_status, current_status, consecutive_failures, failure_threshold)
                     
                     # Gerät ist ausgefallen
                     if current_status == "down" and consecutive_failures >= failure_threshold:
@@ -166,156 +300,151 @@ async def monitoring_loop():
                         # Das stellt sicher, dass auch kurz aufeinanderfolgende Ausfälle verschiedener Server gemeldet werden.
                         should_notify = True
                         
-                        logger.info(f"Entscheidung für {device_name}: Sende DOWN Benachrichtigung? {should_notify}")
+                        logger.info("Entscheidung für %s: Sende DOWN Benachrichtigung? %s", device_name, should_notify)
                         
                         if should_notify:
-                            # Fehlerdetails sammeln
-                            failed_checks = [
-                                c for c in result["checks"] 
-                                if c["status"] == "down"
-                            ]
-                            error_msg = "; ".join([
-                                f"{c['type']}: {c['error']}" 
-                                for c in failed_checks
-                            ])
-                            
-                            global_webhooks_list = userdata.get("global_webhooks", [])
-                            global_webhooks_dict = {w["alias"]: w["url"] for w in global_webhooks_list}
+                            # Fehlerdetails liefert bereits run_checks()
+                            failed_checks = result["failed_checks"]
+                            error_msg = result["error_msg"]
                             
-                            logger.info(f"Benachrichtigungs-Evaluation für {device_name}. Master Enabled: {device.notifications_enabled}, Global Webhooks Set: {device.global_webhooks}, Specific Webhook Set: {bool(device.webhook_url)}")
+                            logger.info("Benachrichtigungs-Evaluation für %s. Master Enabled: %s, Global Webhooks Set: %s, Specific Webhook Set: %s", device_name, device.notifications_enabled, device.global_webhooks, bool(device.webhook_url))
                             
                             if device.notifications_enabled:
                                 sent_any = False
                                 # 1. Globale Benachrichtigungen
                                 for alias in device.global_webhooks:
-                                    url = global_webhooks_dict.get(alias)
-                                    if url:
+                                    notifier = global_notifiers.get(alias)
+                                    if notifier:
                                         try:
-                                            logger.info(f"Sende DOWN-Benachrichtigung an globalen Webhook '{alias}' für {device_name}")
-                                            temp_notifier = TeamsNotifier(url)
-                                            await temp_notifier.send_device_down(
+                                            logger.info("Sende DOWN-Benachrichtigung an globalen Webhook '%s' für %s", alias, device_name)
+                                            await notifier.send_device_down(
                                                 device_name=device_name,
-                                                check_type=failed_checks[0]["type"] if failed_checks else "unknown",
+                                                check_type=failed_checks[0] if failed_checks else "unknown",
                                                 error=error_msg
                                             )
                                             sent_any = True
                                         except Exception as e:
-                                            logger.error(f"Fehler beim Senden der globalen Benachrichtigung '{alias}': {e}")
+                                            logger.error("Fehler beim Senden der globalen Benachrichtigung '%s': %s", alias, e)
                                         
                                 # 2. Server-spezifische Benachrichtigung
                                 if device.webhook_url:
                                     try:
-                                        logger.info(f"Sende DOWN-Benachrichtigung an spezifischen Webhook für {device_name}")
-                                        spec_notifier = TeamsNotifier(device.webhook_url)
-                                        await spec_notifier.send_device_down(
+                                        logger.info("Sende DOWN-Benachrichtigung an spezifischen Webhook für %s", device_name)
+                                        await get_notifier(device.webhook_url).send_device_down(
                                             device_name=device_name,
-                                            check_type=failed_checks[0]["type"] if failed_checks else "unknown",
+                                            check_type=failed_checks[0] if failed_checks else "unknown",
                                             error=error_msg
                                         )
                                         sent_any = True
                                     except Exception as e:
-                                        logger.error(f"Fehler beim Senden der spezifischen Benachrichtigung: {e}")
+                                        logger.error("Fehler beim Senden der spezifischen Benachrichtigung: %s", e)
                                         
                                 # Timestamp aktualisieren, egal ob 1 oder beide gesendet wurden
                                 if sent_any:
                                     device.last_notification_time = device.last_check_time
                                 else:
-                                    logger.info(f"Keine aktiven Webhooks für {device_name} (Global URLs fehlen, und spezifischer Webhook fehlt)")
+                                    logger.info("Keine aktiven Webhooks für %s (Global URLs fehlen, und spezifischer Webhook fehlt)", device_name)
                             else:
-                                logger.info(f"Benachrichtigungen für {device_name} sind deaktiviert (Master Toggle).")
+                                logger.info("Benachrichtigungen für %s sind deaktiviert (Master Toggle).", device_name)
                     
                     # Gerät ist wieder online
                     elif current_status == "up" and previous_status == "down":
-                        logger.info(f"Entscheidung für {device_name}: Sende UP Benachrichtigung")
-                        successful_checks = [
-                            c for c in result["checks"]
-                            if c["status"] == "up"
-                        ]
-                        
-                        global_webhooks_list = userdata.get("global_webhooks", [])
-                        global_webhooks_dict = {w["alias"]: w["url"] for w in global_webhooks_list}
+                        logger.info("Entscheidung für %s: Sende UP Benachrichtigung", device_name)
+                        successful_checks = result["successful_checks"]
                         
                         if device.notifications_enabled:
                             sent_any = False
                             # 1. Globale Benachrichtigungen
                             for alias in device.global_webhooks:
-                                url = global_webhooks_dict.get(alias)
-                                if url:
+                                notifier = global_notifiers.get(alias)
+                                if notifier:
                                     try:
-                                        logger.info(f"Sende UP-Benachrichtigung an globalen Webhook '{alias}' für {device_name}")
-                                        temp_notifier = TeamsNotifier(url)
-                                        await temp_notifier.send_device_up(
+                                        logger.info("Sende UP-Benachrichtigung an globalen Webhook '%s' für %s", alias, device_name)
+                                        await notifier.send_device_up(
                                             device_name=device_name,
-                                            check_type=successful_checks[0]["type"] if successful_checks else "unknown"
+                                            check_type=successful_checks[0] if successful_checks else "unknown"
                                         )
                                         sent_any = True
                                     except Exception as e:
-                                        logger.error(f"Fehler beim Senden der globalen Benachrichtigung '{alias}': {e}")
+                                        logger.error("Fehler beim Senden der globalen Benachrichtigung '%s': %s", alias, e)
                                     
                             # 2. Server-spezifische Benachrichtigung
                             if device.webhook_url:
                                 try:
-                                    logger.info(f"Sende UP-Benachrichtigung an spezifischen Webhook für {device_name}")
-                                    spec_notifier = TeamsNotifier(device.webhook_url)
-                                    await spec_notifier.send_device_up(
+                                    logger.info("Sende UP-Benachrichtigung an spezifischen Webhook für %s", device_name)
+                                    await get_notifier(device.webhook_url).send_device_up(
                                         device_name=device_name,
-                                        check_type=successful_checks[0]["type"] if successful_checks else "unknown"
+                                        check_type=successful_checks[0] if successful_checks else "unknown"
                                     )
                                     sent_any = True
                                 except Exception as e:
-                                    logger.error(f"Fehler beim Senden der spezifischen Benachrichtigung: {e}")
+                                    logger.error("Fehler beim Senden der spezifischen Benachrichtigung: %s", e)
                                     
                             if sent_any:
                                 device.last_notification_time = device.last_check_time
             
             # Status an alle verbundenen WebSocket-Clients senden
+            # (unveränderter Status wird nur als kurzes Signal gesendet)
             if active_websockets:
-                status_data = {
-                    "type": "status_update",
-                    "devices": results
-                }
-                
-                # An alle Clients senden (disconnected clients werden entfernt)
-                disconnected = []
-                for ws in active_websockets:
-                    try:
-                        await ws.send_json(status_data)
-                    except Exception:
-                        disconnected.append(ws)
-                
-                for ws in disconnected:
-                    active_websockets.remove(ws)
+                payload_hash = _status_fingerprint(results)
+                if payload_hash == last_broadcast_hash:
+                    await _fanout({"type": "status_unchanged", "timestamp": tick_time.isoformat()})
+                else:
+                    await _fanout({
+                        "type": "status_update",
+                        "timestamp": tick_time.isoformat(),
+                        "devices": results
+                    })
+                    last_broadcast_hash = payload_hash
             
-            logger.info(f"Check-Zyklus abgeschlossen - {len(results)} Geräte geprüft")
+            logger.info("Check-Zyklus abgeschlossen - %s Geräte geprüft", len(results))
         
         except Exception as e:
-            logger.error(f"Fehler im Monitoring Loop: {e}", exc_info=True)
+            logger.error("Fehler im Monitoring Loop: %s", e, exc_info=True)
         
         # Warten bis zum nächsten Check
-        await asyncio.sleep(check_interval)
+        delay = next_tick - loop.time()
+        if delay < 0:
+            logger.warning("Check-Zyklus hat das Intervall um %.1fs überschritten", -delay)
+        # Schläft bis zum nächsten Tick oder bis ein manueller Test angefordert wird
+        try:
+            await asyncio.wait_for(force_check.wait(), timeout=max(0, delay))
+        except asyncio.TimeoutError:
+            pass
+        force_check.clear()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle Management - startet/stoppt Background Tasks"""
-    global monitoring_engine, teams_notifier, config, userdata
+    global monitoring_engine, teams_notifier, config, userdata, device_configs, _userdata_queue, force_check
     
     # Startup
     logger.info("Server wird gestartet...")
     
     # Konfiguration laden
-    config = load_config()
-    userdata = load_userdata()
+    config = await asyncio.to_thread(load_config)
+    userdata = await asyncio.to_thread(load_userdata)
+    # Einträge ohne Namen zählt die MonitoringEngine als ungültig - hier nur überspringen
+    device_configs = {d["name"]: d for d in userdata.get("devices", []) if d.get("name")}
     
     # Monitoring Engine initialisieren
     devices_config = userdata.get("devices", [])
-    monitoring_engine = MonitoringEngine(devices_config)
+    monitoring_engine = MonitoringEngine(
+        devices_config,
+        default_check_timeout=config.get("monitoring", {}).get("check_timeout", 10),
+        max_concurrency=config.get("monitoring", {}).get("max_concurrency", 64)
+    )
     
     # Teams Notifier wird jetzt bei Bedarf direkt instanziiert
     pass
     
+    _userdata_queue = asyncio.Queue()
+    force_check = asyncio.Event()
+    
     # Monitoring Loop als Background Task starten
     monitoring_task = asyncio.create_task(monitoring_loop())
+    writer_task = asyncio.create_task(userdata_writer())
     
     logger.info("Server gestartet und bereit!")
     
@@ -328,6 +457,15 @@ async def lifespan(app: FastAPI):
         await monitoring_task
     except asyncio.CancelledError:
         pass
+    
+    # Ausstehende Userdata noch schreiben
+    _userdata_queue.put_nowait(None)
+    await writer_task
+    
+    await monitoring_engine.aclose()
+    if _notifier_close_tasks:
+        await asyncio.gather(*_notifier_close_tasks)
+    await _close_notifiers(list(notifiers.values()))
 
 
 # FastAPI App erstellen
@@ -342,10 +480,18 @@ app = FastAPI(
 @app.get("/api/status")
 async def get_status() -> Dict[str, Any]:
     """Gibt den aktuellen Status aller Geräte zurück"""
+    # Ergebnisse des letzten Zyklus wiederverwenden, solange die Geräteliste unverändert ist
+    if monitoring_engine.latest_results is not None:
+        return {
+            "devices": monitoring_engine.latest_results,
+            "total_devices": len(monitoring_engine.devices),
+            "timestamp": monitoring_engine.latest_tick_time
+        }
+    
     return {
         "devices": monitoring_engine.get_all_status(),
         "total_devices": len(monitoring_engine.devices),
-        "timestamp": asyncio.get_event_loop().time()
+        "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
 
@@ -374,6 +520,16 @@ class AddDeviceRequest(BaseModel):
     ping_enabled: bool = True
 
 
+def _validate_device_request(host: str, ports: List[int], ping_enabled: bool):
+    """Lehnt Geräte ab, für die kein gültiger Check erzeugt werden kann"""
+    if not host.strip():
+        raise HTTPException(status_code=400, detail="Host is required")
+    if any(not 0 < port < 65536 for port in ports):
+        raise HTTPException(status_code=400, detail="Ports must be between 1 and 65535")
+    if not ping_enabled and not ports:
+        raise HTTPException(status_code=400, detail="Enable ping or add at least one port")
+
+
 @app.post("/api/devices")
 async def add_device(request: AddDeviceRequest) -> Dict[str, Any]:
     """Fügt ein neues Gerät zur Überwachung hinzu"""
@@ -383,6 +539,8 @@ async def add_device(request: AddDeviceRequest) -> Dict[str, Any]:
     if request.name in monitoring_engine.devices:
         raise HTTPException(status_code=400, detail="Device already exists")
     
+    _validate_device_request(request.host, request.ports, request.ping_enabled)
+    
     # Neue Checks erstellen
     checks = []
     
@@ -422,25 +580,25 @@ async def add_device(request: AddDeviceRequest) -> Dict[str, Any]:
         userdata["devices"] = []
         
     userdata["devices"].append(new_device_config)
+    device_configs[request.name] = new_device_config
     
     try:
-        # Config speichern
-        save_userdata(userdata)
+        # Config speichern (im Hintergrund)
+        queue_userdata_save()
         
         # Monitoring Engine aktualisieren
         device_monitor = monitoring_engine.devices.get(request.name)
         if not device_monitor:
-            from monitor import DeviceMonitor
-            new_monitor = DeviceMonitor(
+            new_monitor = monitoring_engine.create_device(
                 request.name, 
                 checks, 
                 new_device_config["notifications_enabled"],
                 new_device_config["webhook_url"],
                 new_device_config["global_webhooks"]
             )
-            monitoring_engine.devices[request.name] = new_monitor
+            monitoring_engine.add_device(new_monitor)
             
-        logger.info(f"Neues Gerät hinzugefügt: {request.name}")
+        logger.info("Neues Gerät hinzugefügt: %s", request.name)
         
         return {
             "status": "success",
@@ -449,7 +607,7 @@ async def add_device(request: AddDeviceRequest) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        logger.error(f"Fehler beim Hinzufügen des Geräts: {e}")
+        logger.error("Fehler beim Hinzufügen des Geräts: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -476,8 +634,10 @@ async def update_device(device_name: str, request: UpdateDeviceRequest) -> Dict[
     if target_name != device_name and target_name in monitoring_engine.devices:
         raise HTTPException(status_code=400, detail="A device with this name already exists")
     
+    _validate_device_request(request.host, request.ports, request.ping_enabled)
+    
     # Gerät in Config finden
-    device_config = next((d for d in userdata.get("devices", []) if d["name"] == device_name), None)
+    device_config = device_configs.get(device_name)
     if not device_config:
          raise HTTPException(status_code=500, detail="Inconsistent state: device in runtime but not in userdata")
 
@@ -505,31 +665,32 @@ async def update_device(device_name: str, request: UpdateDeviceRequest) -> Dict[
     device_config["notifications_enabled"] = request.notifications_enabled
     device_config["webhook_url"] = request.webhook_url
     device_config["global_webhooks"] = request.global_webhooks
+    if target_name != device_name:
+        device_configs[target_name] = device_configs.pop(device_name)
     
     try:
-        save_userdata(userdata)
+        queue_userdata_save()
         
-        # Runtime aktualisieren
-        # Altes Gerät entfernen
-        del monitoring_engine.devices[device_name]
-        
-        # Neues Gerät erstellen
-        from monitor import DeviceMonitor
-        new_monitor = DeviceMonitor(
-            target_name, 
-            checks, 
+        # Runtime aktualisieren - bestehenden Monitor anpassen, Status bleibt erhalten
+        device_monitor = monitoring_engine.devices[device_name]
+        device_monitor.update(
+            checks,
             request.notifications_enabled,
             request.webhook_url,
             request.global_webhooks
         )
-        monitoring_engine.devices[target_name] = new_monitor
+        if target_name != device_name:
+            monitoring_engine.rename_device(device_name, target_name)
+        else:
+            # Erneut registrieren, damit die RAVENNA-Indizes die neuen Checks abbilden
+            monitoring_engine.add_device(device_monitor)
         
-        logger.info(f"Gerät aktualisiert: {device_name} -> {target_name}")
+        logger.info("Gerät aktualisiert: %s -> %s", device_name, target_name)
         
         return {"status": "success", "message": f"Device updated"}
         
     except Exception as e:
-        logger.error(f"Fehler beim Aktualisieren des Geräts: {e}")
+        logger.error("Fehler beim Aktualisieren des Geräts: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -542,19 +703,21 @@ async def delete_device(device_name: str) -> Dict[str, Any]:
         raise HTTPException(status_code=404, detail="Device not found")
         
     # Aus Config entfernen
-    userdata["devices"] = [d for d in userdata.get("devices", []) if d["name"] != device_name]
+    device_config = device_configs.pop(device_name, None)
+    if device_config is not None:
+        _deleted_devices.add(id(device_config))
     
     try:
-        save_userdata(userdata)
+        queue_userdata_save()
         
         # Aus Runtime entfernen
-        del monitoring_engine.devices[device_name]
+        monitoring_engine.remove_device(device_name)
         
-        logger.info(f"Gerät gelöscht: {device_name}")
+        logger.info("Gerät gelöscht: %s", device_name)
         return {"status": "success", "message": f"Device {device_name} deleted"}
         
     except Exception as e:
-        logger.error(f"Fehler beim Löschen des Geräts: {e}")
+        logger.error("Fehler beim Löschen des Geräts: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
         
 
@@ -580,13 +743,14 @@ async def get_settings() -> Dict[str, Any]:
 @app.post("/api/settings")
 async def save_settings(request: SettingsRequest) -> Dict[str, Any]:
     """Speichert die globalen Einstellungen"""
-    global userdata
+    global userdata, settings_gen
     
     # Konvertieren der GlobalWebhook Objekte in dicts
     userdata["global_webhooks"] = [{"alias": w.alias, "url": w.url} for w in request.global_webhooks]
+    settings_gen += 1
     
     try:
-        save_userdata(userdata)
+        queue_userdata_save()
         
         return {"status": "success", "message": "Settings saved"}
     except Exception as e:
@@ -597,7 +761,10 @@ async def save_settings(request: SettingsRequest) -> Dict[str, Any]:
 async def test_webhook(request: TestWebhookRequest) -> Dict[str, Any]:
     """Sendet eine Test-Nachricht an den Webhook"""
     temp_notifier = TeamsNotifier(request.url)
-    success = await temp_notifier.send_test_notification(request.url)
+    try:
+        success = await temp_notifier.send_test_notification(request.url)
+    finally:
+        await temp_notifier.close()
     
     if success:
         return {"status": "success", "message": "Test message sent"}
@@ -605,68 +772,60 @@ async def test_webhook(request: TestWebhookRequest) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Could not send test message. Check the URL.")
 
 
+def _read_version() -> str:
+    with open("version.txt", "r") as f:
+        return f.read().strip()
+
+
 @app.get("/api/version")
 async def get_version() -> Dict[str, str]:
     """Gibt die aktuelle Version zurück"""
     try:
-        with open("version.txt", "r") as f:
-            version = f.read().strip()
+        version = await asyncio.to_thread(_read_version)
         return {"version": version}
     except FileNotFoundError:
         return {"version": "unknown"}
     except Exception as e:
-        logger.error(f"Fehler beim Lesen der Version: {e}")
+        logger.error("Fehler beim Lesen der Version: %s", e)
         return {"version": "error"}
 
 
 @app.post("/api/test")
 async def trigger_manual_test() -> Dict[str, Any]:
     """Löst einen manuellen Test aller Geräte aus"""
-    global monitoring_engine
     logger.info("Manueller Test wurde ausgelöst")
     
-    # Broadcast start
-    if active_websockets:
-        await broadcast_status({"type": "checking_started"})
-    
-    # Alle Geräte prüfen
-    results = await monitoring_engine.check_all_devices()
-    
-    # Ergebnisse broadcasten (wird normalerweise im loop gemacht, aber hier manuell triggern wir return)
-    # Der monitoring_loop läuft weiter, aber wir wollen sofortiges Feedback.
-    # Da monitor.py Ergebnisse zurückgibt, können wir diese senden.
-    
-    status_update = {
-        "type": "status_update",
-        "timestamp": datetime.now().isoformat(),
-        "devices": monitoring_engine.get_all_status()
-    }
-    
-    if active_websockets:
-        await broadcast_status(status_update)
+    # Der Monitoring Loop führt den Check-Zyklus aus und broadcastet die Ergebnisse
+    force_check.set()
     
     return {
         "status": "success",
-        "message": "Test abgeschlossen",
-        "devices_tested": len(results)
+        "message": "Test gestartet",
+        "devices_tested": len(monitoring_engine.devices)
     }
 
-async def broadcast_status(data: Dict[str, Any]):
-    """Hilfsfunktion zum Senden an alle WebSockets"""
-    global active_websockets
-    if not active_websockets:
-        return
-        
-    disconnected = []
-    for ws in active_websockets:
-        try:
-            await ws.send_json(data)
-        except Exception:
-            disconnected.append(ws)
-    
-    for ws in disconnected:
-        if ws in active_websockets:
-            active_websockets.remove(ws)
+async def _fanout(payload: Dict[str, Any]):
+    """Sendet eine Nachricht parallel an alle WebSockets"""
+    # Einmal serialisieren statt pro Client
+    prepared = _dumps(payload)
+    # Snapshot - während des Sends verbundene Clients bleiben unberührt
+    targets = list(active_websockets)
+    
+    # In Batches senden und dazwischen den Event Loop freigeben
+    results = []
+    for i in range(0, len(targets), BROADCAST_BATCH):
+        batch = targets[i:i + BROADCAST_BATCH]
+        results.extend(await asyncio.gather(
+            *(asyncio.wait_for(ws.send_text(prepared), timeout=BROADCAST_TIMEOUT) for ws in batch),
+            return_exceptions=True
+        ))
+        await asyncio.sleep(0)
+    
+    # Fehlgeschlagene Clients in einem Schritt entfernen, damit hängende
+    # Verbindungen nicht bei jedem Broadcast erneut in den Timeout laufen
+    failed = [ws for ws, result in zip(targets, results) if isinstance(result, Exception)]
+    if failed:
+        active_websockets.difference_update(failed)
 
 
 @app.get("/api/troubleshoot/options")
@@ -685,7 +844,7 @@ async def run_troubleshooting(category_id: str) -> Dict[str, Any]:
         return {"error": "Category not found"}
         
     check_tags = category.get("check_tags", [])
-    logger.info(f"Starte Troubleshooting für {category_id} (Tags: {check_tags})")
+    logger.info("Starte Troubleshooting für %s (Tags: %s)", category_id, check_tags)
     
     results = await monitoring_engine.run_troubleshooting(check_tags)
     
@@ -698,22 +857,16 @@ async def run_troubleshooting(category_id: str) -> Dict[str, Any]:
 @app.get("/api/ravenna/status")
 async def get_ravenna_status() -> Dict[str, Any]:
     """Gibt den RAVENNA-Gesamtstatus zurück"""
-    ravenna_devices = []
-    
-    for device_name, device in monitoring_engine.devices.items():
-        # Prüfen ob Gerät RAVENNA-Checks hat
-        has_ptp = any(check.type == "ptp" for check in device.checks)
-        has_multicast = any(check.type == "multicast" for check in device.checks)
-        has_rtp = any(check.type == "rtp" for check in device.checks)
-        
-        if has_ptp or has_multicast or has_rtp:
-            ravenna_devices.append({
-                "name": device_name,
-                "status": device.status,
-                "has_ptp": has_ptp,
-                "has_multicast": has_multicast,
-                "has_rtp": has_rtp
-            })
+    ravenna_devices = [
+        {
+            "name": device_name,
+            "status": device.status,
+            "has_ptp": device.has_ptp,
+            "has_multicast": device.has_multicast,
+            "has_rtp": device.has_rtp
+        }
+        for device_name, device in monitoring_engine.ravenna_devices.items()
+    ]
     
     # Gesamtstatus berechnen
     all_up = all(d["status"] == "up" for d in ravenna_devices)
@@ -729,17 +882,14 @@ async def get_ravenna_status() -> Dict[str, Any]:
 @app.get("/api/ravenna/ptp")
 async def get_ptp_status() -> Dict[str, Any]:
     """Gibt PTP-Synchronisations-Details zurück"""
-    ptp_devices = []
-    
-    for device_name, device in monitoring_engine.devices.items():
-        ptp_checks = [check for check in device.checks if check.type == "ptp"]
-        
-        if ptp_checks:
-            ptp_devices.append({
-                "name": device_name,
-                "status": device.status,
-                "last_check": device.last_check_time.isoformat() if device.last_check_time else None
-            })
+    ptp_devices = [
+        {
+            "name": device_name,
+            "status": device.status,
+            "last_check": device.last_check_time.isoformat() if device.last_check_time else None
+        }
+        for device_name, device in monitoring_engine.ptp_devices.items()
+    ]
     
     ravenna_config = config.get("monitoring", {}).get("ravenna", {})
     
@@ -755,19 +905,15 @@ async def get_ptp_status() -> Dict[str, Any]:
 @app.get("/api/ravenna/streams")
 async def get_stream_status() -> Dict[str, Any]:
     """Gibt Audio-Stream-Übersicht zurück"""
-    stream_devices = []
-    
-    for device_name, device in monitoring_engine.devices.items():
-        rtp_checks = [check for check in device.checks if check.type == "rtp"]
-        multicast_checks = [check for check in device.checks if check.type == "multicast"]
-        
-        if rtp_checks or multicast_checks:
-            stream_devices.append({
-                "name": device_name,
-                "status": device.status,
-                "has_rtp": len(rtp_checks) > 0,
-                "has_multicast": len(multicast_checks) > 0
-            })
+    stream_devices = [
+        {
+            "name": device_name,
+            "status": device.status,
+            "has_rtp": device.has_rtp,
+            "has_multicast": device.has_multicast
+        }
+        for device_name, device in monitoring_engine.stream_devices.items()
+    ]
     
     return {
         "total_stream_devices": len(stream_devices),
@@ -780,9 +926,9 @@ async def get_stream_status() -> Dict[str, Any]:
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket für Echtzeit-Updates"""
     await websocket.accept()
-    active_websockets.append(websocket)
+    active_websockets.add(websocket)
     
-    logger.info(f"WebSocket Client verbunden (Total: {len(active_websockets)})")
+    logger.info("WebSocket Client verbunden (Total: %s)", len(active_websockets))
     
     try:
         # Initialen Status senden
@@ -802,10 +948,9 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         logger.info("WebSocket Client getrennt")
     except Exception as e:
-        logger.error(f"WebSocket Fehler: {e}")
+        logger.error("WebSocket Fehler: %s", e)
     finally:
-        if websocket in active_websockets:
-            active_websockets.remove(websocket)
+        active_websockets.discard(websocket)
 
 
 # Static files für Frontend
@@ -828,15 +973,23 @@ if __name__ == "__main__":
         host = server_config.get("host", "0.0.0.0")
         port = server_config.get("port", 8000)
         
-        logger.info(f"Starte Server auf {host}:{port}")
+        # uvloop explizit verwenden, wenn installiert (nicht unter Windows verfügbar)
+        try:
+            import uvloop  # noqa: F401
+            loop_impl = "uvloop"
+        except ImportError:
+            loop_impl = "asyncio"
+        
+        logger.info("Starte Server auf %s:%s (Event-Loop: %s)", host, port, loop_impl)
         
         uvicorn.run(
             "api:app",
             host=host,
             port=port,
             reload=False,
-            log_level="info"
+            log_level="info",
+            loop=loop_impl
         )
     except Exception as e:
-        logger.error(f"Fehler beim Starten des Servers: {e}")
+        logger.error("Fehler beim Starten des Servers: %s", e)
         raise
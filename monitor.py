@@ -4,18 +4,131 @@ Führt verschiedene Checks aus und verwaltet den Status
 """
 
 import asyncio
+import ipaddress
 import logging
 import platform
 import subprocess
+import time
 import socket
-from datetime import datetime
-from typing import Dict, List, Any, Optional
+import struct
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple
 from enum import Enum
 
 import httpx
+import icmplib
 
 logger = logging.getLogger(__name__)
 
+# Wird False, sobald unprivilegierte ICMP-Sockets nicht erlaubt sind (z.B. Container
+# ohne ping_group_range/CAP_NET_RAW) - danach wird direkt das ping-Binary verwendet
+_icmp_sockets_allowed = True
+
+# Ping-Befehle für den Subprozess-Fallback, abhängig vom Betriebssystem (einmalig bestimmt)
+_SYSTEM = platform.system().lower()
+if _SYSTEM == "windows":
+    _PING_PREFIX = ("ping", "-n", "3", "-w", "3000")
+elif _SYSTEM == "darwin":
+    # macOS ping -W erwartet Millisekunden
+    _PING_PREFIX = ("ping", "-c", "3", "-W", "3000")
+else:
+    # Linux ping -W erwartet Sekunden
+    _PING_PREFIX = ("ping", "-c", "3", "-W", "3")
+_QOS_PING_PREFIX = ("ping", "-n" if _SYSTEM == "windows" else "-c", "1", "-W", "3")
+
+# Feste Fehlermeldungen der Checks (ein gemeinsames String-Objekt statt Literal je Check-Klasse)
+_ERR_NO_TARGET = "Kein Ziel angegeben"
+_ERR_NO_URL = "Keine URL angegeben"
+_ERR_NO_HOST = "Host nicht angegeben"
+_ERR_NO_HOST_PORT = "Host oder Port nicht angegeben"
+_ERR_PING_NO_REPLY = "Ping fehlgeschlagen (keine Antwort)"
+_ERR_PING_TIMEOUT = "Ping Timeout"
+_ERR_HTTP_TIMEOUT = "HTTP Timeout"
+_ERR_CHECK_TIMEOUT = "Check Timeout"
+_ERR_PTP_NOT_IMPLEMENTED = "PTP-Prüfung nicht implementiert"
+
+
+async def _icmp_ping(target: str, timeout: float = 3.0) -> Optional[icmplib.Host]:
+    """Sendet einen ICMP Echo Request über einen Socket im eigenen Prozess
+    
+    Returns:
+        icmplib.Host oder None, wenn ICMP-Sockets nicht verfügbar sind
+    """
+    global _icmp_sockets_allowed
+    if not _icmp_sockets_allowed:
+        return None
+    
+    try:
+        # Wie beim ping-Binary (-c 3): eine Antwort von drei genügt für UP
+        return await icmplib.async_ping(target, count=3, interval=0.2, timeout=timeout, privileged=False)
+    except icmplib.SocketPermissionError:
+        logger.warning("ICMP-Sockets nicht erlaubt - verwende ping-Befehl als Fallback")
+        _icmp_sockets_allowed = False
+        return None
+
+
+async def _icmp_result(check: "BaseCheck", target: str) -> Optional[icmplib.Host]:
+    """Liefert das Ergebnis des Sammel-Pings der Engine oder pingt selbst"""
+    future = check.result_future
+    if future is not None:
+        check.result_future = None
+        return await future
+    return await _icmp_ping(target)
+
+
+class DNSCache:
+    """Cache für Namensauflösungen mit Ablaufzeit
+    
+    Löst Hostnamen nicht-blockierend über loop.getaddrinfo auf und merkt sich
+    das Ergebnis für ttl Sekunden. IP-Adressen werden direkt zurückgegeben.
+    """
+    
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+    
+    async def resolve_all(self, host: str, family: int = socket.AF_UNSPEC) -> List[str]:
+        """Gibt alle IP-Adressen für host in der Reihenfolge von getaddrinfo zurück
+        (wirft socket.gaierror bei Fehlern)"""
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+        
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        key = (host, family)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+        
+        infos = await loop.getaddrinfo(host, None, family=family, type=socket.SOCK_STREAM)
+        ips = list(dict.fromkeys(info[4][0] for info in infos))
+        self._entries[key] = (ips, now + self.ttl)
+        return ips
+    
+    async def resolve(self, host: str, family: int = socket.AF_UNSPEC) -> str:
+        """Gibt die erste IP-Adresse für host zurück (wirft socket.gaierror bei Fehlern)"""
+        return (await self.resolve_all(host, family))[0]
+
+
+async def _open_connection(dns_cache: DNSCache, host: str, port: int):
+    """Öffnet eine TCP-Verbindung und nutzt dabei den DNS-Cache
+    
+    Wie asyncio.open_connection mit Hostnamen werden alle aufgelösten Adressen
+    nacheinander versucht (z.B. ::1 und 127.0.0.1 bei Dual-Stack-Namen).
+    """
+    last_error: Optional[OSError] = None
+    for ip in await dns_cache.resolve_all(host):
+        try:
+            return await asyncio.open_connection(ip, port)
+        except OSError as e:
+            last_error = e
+    raise last_error
+
 
 class CheckStatus(str, Enum):
     """Status eines Checks"""
@@ -24,30 +137,27 @@ class CheckStatus(str, Enum):
     UNKNOWN = "unknown"
 
 
+@dataclass(slots=True)
 class CheckResult:
     """Ergebnis eines einzelnen Checks"""
-    
-    def __init__(
-        self,
-        status: CheckStatus,
-        response_time: Optional[float] = None,
-        error: Optional[str] = None,
-        details: Optional[str] = None
-    ):
-        self.status = status
-        self.response_time = response_time
-        self.error = error
-        self.details = details
-        self.timestamp = datetime.now()
+    status: CheckStatus
+    response_time: Optional[float] = None
+    error: Optional[str] = None
+    details: Optional[str] = None
+    timestamp: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 class BaseCheck:
     """Basis-Klasse für alle Check-Typen"""
     
+    __slots__ = ("config", "type", "tags", "_static_meta")
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.type = config.get("type", "unknown")
         self.tags = set(config.get("tags", []))
+        # Statische Felder für die Ergebnis-Dicts (wird in _create_checks ergänzt)
+        self._static_meta: Dict[str, Any] = {"type": self.type}
     
     async def execute(self) -> CheckResult:
         """Führt den Check aus - muss von Subklassen implementiert werden"""
@@ -57,24 +167,47 @@ class BaseCheck:
 class PingCheck(BaseCheck):
     """ICMP Ping Check"""
     
+    __slots__ = ("target", "result_future")
+    
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.target = config.get("target")
+        if not self.target:
+            raise ValueError(_ERR_NO_TARGET)
+        # Wird von MonitoringEngine.check_all_devices mit dem Ergebnis des Sammel-Pings befüllt
+        self.result_future: Optional[asyncio.Future] = None
+    
+    @property
+    def icmp_target(self) -> str:
+        return self.target
+    
     async def execute(self) -> CheckResult:
-        target = self.config.get("target")
-        if not target:
-            return CheckResult(CheckStatus.UNKNOWN, error="Kein Ziel angegeben")
-        
-        # Ping-Befehl abhängig vom Betriebssystem
-        sys_name = platform.system().lower()
-        if sys_name == "windows":
-            command = ["ping", "-n", "3", "-w", "3000", target]
-        elif sys_name == "darwin":
-            # macOS ping -W erwartet Millisekunden
-            command = ["ping", "-c", "3", "-W", "3000", target]
-        else:
-            # Linux ping -W erwartet Sekunden
-            command = ["ping", "-c", "3", "-W", "3", target]
+        target = self.target
+        
+        try:
+            host = await _icmp_result(self, target)
+        except icmplib.NameLookupError:
+            return CheckResult(CheckStatus.DOWN, error=f"Ping Fehler: {target} nicht auflösbar")
+        except Exception as e:
+            return CheckResult(CheckStatus.DOWN, error=f"Ping Fehler: {str(e)}")
+        
+        if host is None:
+            return await self._execute_subprocess(target)
+        
+        if host.is_alive:
+            return CheckResult(
+                CheckStatus.UP,
+                response_time=host.avg_rtt,
+                details=f"Ping erfolgreich ({host.avg_rtt:.1f}ms)"
+            )
+        return CheckResult(CheckStatus.DOWN, error=_ERR_PING_NO_REPLY)
+    
+    async def _execute_subprocess(self, target: str) -> CheckResult:
+        """Fallback über das ping-Binary, falls keine ICMP-Sockets verfügbar sind"""
+        command = (*_PING_PREFIX, target)
         
         try:
-            start_time = asyncio.get_event_loop().time()
+            start_time = time.perf_counter()
             
             # Ping ausführen
             process = await asyncio.create_subprocess_exec(
@@ -88,7 +221,7 @@ class PingCheck(BaseCheck):
                 timeout=10.0
             )
             
-            response_time = (asyncio.get_event_loop().time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             if process.returncode == 0:
                 return CheckResult(
@@ -103,7 +236,7 @@ class PingCheck(BaseCheck):
                 )
         
         except asyncio.TimeoutError:
-            return CheckResult(CheckStatus.DOWN, error="Ping Timeout")
+            return CheckResult(CheckStatus.DOWN, error=_ERR_PING_TIMEOUT)
         except Exception as e:
             return CheckResult(CheckStatus.DOWN, error=f"Ping Fehler: {str(e)}")
 
@@ -111,20 +244,31 @@ class PingCheck(BaseCheck):
 class HttpCheck(BaseCheck):
     """HTTP/HTTPS Endpoint Check"""
     
+    __slots__ = ("url", "expected_status", "http_client")
+    
+    def __init__(self, config: Dict[str, Any], http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(config)
+        self.url = config.get("url")
+        if not self.url:
+            raise ValueError(_ERR_NO_URL)
+        self.expected_status = config.get("expected_status", 200)
+        # Gemeinsamer Client der Engine (Keep-Alive/HTTP2), None = eigener Client pro Aufruf
+        self.http_client = http_client
+    
     async def execute(self) -> CheckResult:
-        url = self.config.get("url")
-        expected_status = self.config.get("expected_status", 200)
-        
-        if not url:
-            return CheckResult(CheckStatus.UNKNOWN, error="Keine URL angegeben")
+        url = self.url
+        expected_status = self.expected_status
         
         try:
-            start_time = asyncio.get_event_loop().time()
+            start_time = time.perf_counter()
             
-            async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-                response = await client.get(url)
+            if self.http_client is not None:
+                response = await self.http_client.get(url)
+            else:
+                async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
+                    response = await client.get(url)
             
-            response_time = (asyncio.get_event_loop().time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             if response.status_code == expected_status:
                 return CheckResult(
@@ -139,7 +283,7 @@ class HttpCheck(BaseCheck):
                 )
         
         except httpx.TimeoutException:
-            return CheckResult(CheckStatus.DOWN, error="HTTP Timeout")
+            return CheckResult(CheckStatus.DOWN, error=_ERR_HTTP_TIMEOUT)
         except Exception as e:
             return CheckResult(CheckStatus.DOWN, error=f"HTTP Fehler: {str(e)}")
 
@@ -147,27 +291,35 @@ class HttpCheck(BaseCheck):
 class PortCheck(BaseCheck):
     """TCP Port Check"""
     
+    __slots__ = ("host", "port", "description", "dns_cache")
+    
+    def __init__(self, config: Dict[str, Any], dns_cache: Optional[DNSCache] = None):
+        super().__init__(config)
+        self.host = config.get("host")
+        self.port = config.get("port")
+        if not self.host or not self.port:
+            raise ValueError(_ERR_NO_HOST_PORT)
+        self.description = config.get("description", f"Port {self.port}")
+        self.dns_cache = dns_cache or DNSCache()
+    
     async def execute(self) -> CheckResult:
-        host = self.config.get("host")
-        port = self.config.get("port")
-        description = self.config.get("description", f"Port {port}")
-        
-        if not host or not port:
-            return CheckResult(CheckStatus.UNKNOWN, error="Host oder Port nicht angegeben")
+        host = self.host
+        port = self.port
+        description = self.description
         
         try:
-            start_time = asyncio.get_event_loop().time()
+            start_time = time.perf_counter()
             
             # TCP Verbindung versuchen
             reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(host, port),
+                _open_connection(self.dns_cache, host, port),
                 timeout=5.0
             )
             
-            response_time = (asyncio.get_event_loop().time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
+            # Nur Erreichbarkeit prüfen - nicht auf den FIN/ACK-Abbau warten
             writer.close()
-            await writer.wait_closed()
             
             return CheckResult(
                 CheckStatus.UP,
@@ -186,53 +338,21 @@ class PortCheck(BaseCheck):
 class PTPCheck(BaseCheck):
     """PTP (Precision Time Protocol) Check für RAVENNA/AES67
     
-    Überprüft die PTP-Synchronisation durch Testen der PTP-Ports (319/320)
-    und optional der Multicast-Adresse 224.0.1.129
+    Eine echte Prüfung der PTP-Synchronisation (Ports 319/320, Multicast
+    224.0.1.129) ist noch nicht implementiert - der Check meldet daher
+    'unknown' statt eines ungeprüften 'up'.
     """
     
+    __slots__ = ("host",)
+    
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.host = config.get("host")
+        if not self.host:
+            raise ValueError(_ERR_NO_HOST)
+    
     async def execute(self) -> CheckResult:
-        host = self.config.get("host")
-        ptp_ports = self.config.get("ptp_ports", [319, 320])
-        multicast_addr = self.config.get("multicast", "224.0.1.129")
-        
-        if not host:
-            return CheckResult(CheckStatus.UNKNOWN, error="Host nicht angegeben")
-        
-        try:
-            start_time = asyncio.get_event_loop().time()
-            results = []
-            
-            # PTP Event Messages (Port 319) und General Messages (Port 320) prüfen
-            for port in ptp_ports:
-                try:
-                    # UDP Socket für PTP erstellen
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                    sock.settimeout(3.0)
-                    
-                    # Versuchen zu binden um zu prüfen ob Port verfügbar ist
-                    # In Produktion würde man hier PTP-Pakete analysieren
-                    sock.close()
-                    results.append(f"Port {port} OK")
-                except Exception as e:
-                    results.append(f"Port {port} Fehler: {str(e)}")
-            
-            response_time = (asyncio.get_event_loop().time() - start_time) * 1000
-            
-            # Wenn mindestens ein Port erreichbar ist, gilt der Check als erfolgreich
-            if len(results) > 0:
-                return CheckResult(
-                    CheckStatus.UP,
-                    response_time=response_time,
-                    details=f"PTP verfügbar: {', '.join(results)} ({response_time:.1f}ms)"
-                )
-            else:
-                return CheckResult(
-                    CheckStatus.DOWN,
-                    error="Keine PTP-Ports erreichbar"
-                )
-        
-        except Exception as e:
-            return CheckResult(CheckStatus.DOWN, error=f"PTP Check Fehler: {str(e)}")
+        return CheckResult(CheckStatus.UNKNOWN, error=_ERR_PTP_NOT_IMPLEMENTED)
 
 
 class MulticastCheck(BaseCheck):
@@ -241,59 +361,68 @@ class MulticastCheck(BaseCheck):
     Überprüft ob Multicast-Gruppen erreichbar sind und IGMP funktioniert
     """
     
+    __slots__ = ("multicast_group", "port", "timeout", "dns_cache")
+    
+    def __init__(self, config: Dict[str, Any], dns_cache: Optional[DNSCache] = None):
+        super().__init__(config)
+        self.multicast_group = config.get("multicast_group", "239.69.0.1")
+        self.port = config.get("port", 5004)
+        self.timeout = config.get("timeout", 3)
+        self.dns_cache = dns_cache or DNSCache()
+    
     async def execute(self) -> CheckResult:
-        multicast_group = self.config.get("multicast_group", "239.69.0.1")
-        port = self.config.get("port", 5004)
-        timeout = self.config.get("timeout", 3)
+        multicast_group = self.multicast_group
+        port = self.port
+        timeout = self.timeout
         
         try:
-            start_time = asyncio.get_event_loop().time()
+            start_time = time.perf_counter()
             
             # DNS-Auflösung für Multicast-Gruppe (falls Hostname angegeben)
             try:
                 # Versuche DNS-Auflösung, falls es ein Hostname ist
-                resolved_ip = socket.gethostbyname(multicast_group)
+                resolved_ip = await self.dns_cache.resolve(multicast_group, socket.AF_INET)
             except socket.gaierror:
                 # Wenn Auflösung fehlschlägt, verwende den Wert direkt (sollte IP sein)
                 resolved_ip = multicast_group
             
-            # Multicast Socket erstellen
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            
-            # Multicast-Gruppe beitreten
+            # Socket-Operationen (Gruppenbeitritt, bind) im Thread-Pool ausführen,
+            # damit die Event-Loop die übrigen Checks weiter bedient
             try:
-                import struct
-                mreq = struct.pack("4sl", socket.inet_aton(resolved_ip), socket.INADDR_ANY)
-                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-                sock.settimeout(timeout)
-                
-                # Versuchen zu binden
-                sock.bind(('', port))
-                
-                response_time = (asyncio.get_event_loop().time() - start_time) * 1000
-                sock.close()
-                
-                details_msg = f"Multicast-Gruppe {multicast_group}"
-                if resolved_ip != multicast_group:
-                    details_msg += f" ({resolved_ip})"
-                details_msg += f":{port} erreichbar ({response_time:.1f}ms)"
-                
-                return CheckResult(
-                    CheckStatus.UP,
-                    response_time=response_time,
-                    details=details_msg
-                )
-            
+                await asyncio.to_thread(self._do_multicast_join, resolved_ip, port, timeout)
             except Exception as e:
-                sock.close()
                 return CheckResult(
                     CheckStatus.DOWN,
                     error=f"Multicast-Gruppe nicht erreichbar: {str(e)}"
                 )
+            
+            response_time = (time.perf_counter() - start_time) * 1000
+            
+            details_msg = f"Multicast-Gruppe {multicast_group}"
+            if resolved_ip != multicast_group:
+                details_msg += f" ({resolved_ip})"
+            details_msg += f":{port} erreichbar ({response_time:.1f}ms)"
+            
+            return CheckResult(
+                CheckStatus.UP,
+                response_time=response_time,
+                details=details_msg
+            )
         
         except Exception as e:
             return CheckResult(CheckStatus.DOWN, error=f"Multicast Check Fehler: {str(e)}")
+    
+    @staticmethod
+    def _do_multicast_join(resolved_ip: str, port: int, timeout: float):
+        """Tritt der Multicast-Gruppe bei und bindet den Port (blockierend)"""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            mreq = struct.pack("4sl", socket.inet_aton(resolved_ip), socket.INADDR_ANY)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+            sock.settimeout(timeout)
+            
+            # Versuchen zu binden
+            sock.bind(('', port))
 
 
 class RTPStreamCheck(BaseCheck):
@@ -302,41 +431,44 @@ class RTPStreamCheck(BaseCheck):
     Überprüft ob RTP Audio-Streams verfügbar sind
     """
     
+    __slots__ = ("host", "port", "description")
+    
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.host = config.get("host")
+        self.port = config.get("port", 5004)
+        if not self.host or not self.port:
+            raise ValueError(_ERR_NO_HOST_PORT)
+        self.description = config.get("description", "RTP Stream")
+    
     async def execute(self) -> CheckResult:
-        host = self.config.get("host")
-        port = self.config.get("port", 5004)
-        description = self.config.get("description", "RTP Stream")
-        
-        if not host or not port:
-            return CheckResult(CheckStatus.UNKNOWN, error="Host oder Port nicht angegeben")
+        port = self.port
+        description = self.description
         
         try:
-            start_time = asyncio.get_event_loop().time()
+            start_time = time.perf_counter()
             
             # UDP Socket für RTP erstellen
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.settimeout(3.0)
-            
-            try:
-                # Versuchen an RTP-Port zu binden
-                # In Produktion würde man hier RTP-Pakete analysieren (Packet Loss, Jitter)
-                sock.bind(('', 0))  # Bind to any available port
-                sock.close()
-                
-                response_time = (asyncio.get_event_loop().time() - start_time) * 1000
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.settimeout(3.0)
                 
-                return CheckResult(
-                    CheckStatus.UP,
-                    response_time=response_time,
-                    details=f"{description} Port {port} verfügbar ({response_time:.1f}ms)"
-                )
+                try:
+                    # Versuchen an RTP-Port zu binden
+                    # In Produktion würde man hier RTP-Pakete analysieren (Packet Loss, Jitter)
+                    sock.bind(('', 0))  # Bind to any available port
+                except Exception as e:
+                    return CheckResult(
+                        CheckStatus.DOWN,
+                        error=f"{description} nicht verfügbar: {str(e)}"
+                    )
             
-            except Exception as e:
-                sock.close()
-                return CheckResult(
-                    CheckStatus.DOWN,
-                    error=f"{description} nicht verfügbar: {str(e)}"
-                )
+            response_time = (time.perf_counter() - start_time) * 1000
+            
+            return CheckResult(
+                CheckStatus.UP,
+                response_time=response_time,
+                details=f"{description} Port {port} verfügbar ({response_time:.1f}ms)"
+            )
         
         except Exception as e:
             return CheckResult(CheckStatus.DOWN, error=f"RTP Stream Check Fehler: {str(e)}")
@@ -349,21 +481,51 @@ class QoSCheck(BaseCheck):
     Hinweis: Vollständige QoS-Prüfung erfordert Netzwerk-Analyse-Tools
     """
     
+    __slots__ = ("host", "expected_dscp", "description", "result_future")
+    
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.host = config.get("host")
+        if not self.host:
+            raise ValueError(_ERR_NO_HOST)
+        self.expected_dscp = config.get("dscp", 46)  # Default: EF für PTP
+        self.description = config.get("description", "QoS")
+        # Wird von MonitoringEngine.check_all_devices mit dem Ergebnis des Sammel-Pings befüllt
+        self.result_future: Optional[asyncio.Future] = None
+    
+    @property
+    def icmp_target(self) -> str:
+        return self.host
+    
     async def execute(self) -> CheckResult:
-        host = self.config.get("host")
-        expected_dscp = self.config.get("dscp", 46)  # Default: EF für PTP
-        description = self.config.get("description", "QoS")
+        host = self.host
+        expected_dscp = self.expected_dscp
+        description = self.description
+        
+        # Basis-Erreichbarkeitstest mit Ping
+        # In Produktion würde man hier DSCP-Markierungen analysieren
+        try:
+            icmp_host = await _icmp_result(self, host)
+        except Exception as e:
+            return CheckResult(CheckStatus.DOWN, error=f"QoS Check Fehler: {str(e)}")
         
-        if not host:
-            return CheckResult(CheckStatus.UNKNOWN, error="Host nicht angegeben")
+        if icmp_host is None:
+            return await self._execute_subprocess(host, expected_dscp, description)
         
+        if icmp_host.is_alive:
+            return CheckResult(
+                CheckStatus.UP,
+                response_time=icmp_host.avg_rtt,
+                details=f"{description} Check OK (DSCP {expected_dscp} erwartet) ({icmp_host.avg_rtt:.1f}ms)"
+            )
+        return CheckResult(CheckStatus.DOWN, error=f"{description} Check fehlgeschlagen")
+    
+    async def _execute_subprocess(self, host: str, expected_dscp: int, description: str) -> CheckResult:
+        """Fallback über das ping-Binary, falls keine ICMP-Sockets verfügbar sind"""
         try:
-            start_time = asyncio.get_event_loop().time()
+            start_time = time.perf_counter()
             
-            # Basis-Erreichbarkeitstest mit Ping
-            # In Produktion würde man hier DSCP-Markierungen analysieren
-            param = "-n" if platform.system().lower() == "windows" else "-c"
-            command = ["ping", param, "1", "-W", "3", host]
+            command = (*_QOS_PING_PREFIX, host)
             
             process = await asyncio.create_subprocess_exec(
                 *command,
@@ -376,7 +538,7 @@ class QoSCheck(BaseCheck):
                 timeout=5.0
             )
             
-            response_time = (asyncio.get_event_loop().time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             if process.returncode == 0:
                 return CheckResult(
@@ -400,25 +562,40 @@ class RAVENNAServiceCheck(BaseCheck):
     Überprüft RAVENNA-spezifische Services wie RTSP, SAP, Web-UIs
     """
     
+    __slots__ = ("host", "port", "is_http", "description", "url", "http_client", "dns_cache")
+    
+    def __init__(self, config: Dict[str, Any], http_client: Optional[httpx.AsyncClient] = None, dns_cache: Optional[DNSCache] = None):
+        super().__init__(config)
+        self.host = config.get("host")
+        self.port = config.get("port")
+        if not self.host or not self.port:
+            raise ValueError(_ERR_NO_HOST_PORT)
+        # rtsp, sap, http - auch bei "service_type: null" auf rtsp zurückfallen
+        service_type = str(config.get("service_type") or "rtsp")
+        self.is_http = service_type.lower() in ("http", "https")
+        self.description = config.get("description", f"RAVENNA {service_type.upper()}")
+        self.url = config.get("url", f"http://{self.host}:{self.port}")
+        self.http_client = http_client
+        self.dns_cache = dns_cache or DNSCache()
+    
     async def execute(self) -> CheckResult:
-        host = self.config.get("host")
-        port = self.config.get("port")
-        service_type = self.config.get("service_type", "rtsp")  # rtsp, sap, http
-        description = self.config.get("description", f"RAVENNA {service_type.upper()}")
-        
-        if not host or not port:
-            return CheckResult(CheckStatus.UNKNOWN, error="Host oder Port nicht angegeben")
+        host = self.host
+        port = self.port
+        description = self.description
         
         try:
-            start_time = asyncio.get_event_loop().time()
+            start_time = time.perf_counter()
             
-            if service_type.lower() == "http" or service_type.lower() == "https":
+            if self.is_http:
                 # HTTP/HTTPS Check für Web-UIs
-                url = self.config.get("url", f"http://{host}:{port}")
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.get(url)
+                url = self.url
+                if self.http_client is not None:
+                    response = await self.http_client.get(url, follow_redirects=False)
+                else:
+                    async with httpx.AsyncClient(timeout=10.0) as client:
+                        response = await client.get(url)
                 
-                response_time = (asyncio.get_event_loop().time() - start_time) * 1000
+                response_time = (time.perf_counter() - start_time) * 1000
                 
                 if response.status_code < 400:
                     return CheckResult(
@@ -434,14 +611,13 @@ class RAVENNAServiceCheck(BaseCheck):
             else:
                 # TCP Port Check für RTSP (554), SAP (9875), etc.
                 reader, writer = await asyncio.wait_for(
-                    asyncio.open_connection(host, port),
+                    _open_connection(self.dns_cache, host, port),
                     timeout=5.0
                 )
                 
-                response_time = (asyncio.get_event_loop().time() - start_time) * 1000
+                response_time = (time.perf_counter() - start_time) * 1000
                 
                 writer.close()
-                await writer.wait_closed()
                 
                 return CheckResult(
                     CheckStatus.UP,
@@ -458,8 +634,14 @@ class RAVENNAServiceCheck(BaseCheck):
 class DeviceMonitor:
     """Überwacht ein einzelnes Gerät mit mehreren Checks"""
     
-    def __init__(self, name: str, checks_config: List[Dict[str, Any]], notifications_enabled: bool = True, webhook_url: Optional[str] = None, global_webhooks: List[str] = None):
+    def __init__(self, name: str, checks_config: List[Dict[str, Any]], notifications_enabled: bool = True, webhook_url: Optional[str] = None, global_webhooks: List[str] = None, http_client: Optional[httpx.AsyncClient] = None, dns_cache: Optional[DNSCache] = None, check_timeout: float = 10.0, semaphore: Optional[asyncio.Semaphore] = None):
         self.name = name
+        # Obergrenze pro Check in Sekunden (überschreibbar per "timeout" in der Check-Config)
+        self.check_timeout = check_timeout
+        # Begrenzt die gleichzeitig laufenden Checks (von der Engine geteilt)
+        self.semaphore = semaphore
+        self.http_client = http_client
+        self.dns_cache = dns_cache or DNSCache()
         self.checks = self._create_checks(checks_config)
         self.notifications_enabled = notifications_enabled
         self.webhook_url = webhook_url
@@ -468,67 +650,122 @@ class DeviceMonitor:
         self.last_check_time: Optional[datetime] = None
         self.consecutive_failures = 0
         self.last_notification_time: Optional[datetime] = None
-        self.last_check_results: List[Dict[str, Any]] = []
+        # Ein Platz pro Check (gleiche Reihenfolge wie self.checks), wird pro Zyklus überschrieben
+        self.last_check_results: List[Optional[Dict[str, Any]]] = [None] * len(self.checks)
+        self._index_checks()
 
         # Initial populate last_check_results with unknown state for immediate display
         self._init_unknown_state()
 
+    def update(self, checks_config: List[Dict[str, Any]], notifications_enabled: bool = True, webhook_url: Optional[str] = None, global_webhooks: List[str] = None):
+        """Übernimmt neue Checks und Einstellungen, behält aber den Laufzeit-Status
+        (Status, Fehlerzähler, letzte Check- und Benachrichtigungszeit)"""
+        self.checks = self._create_checks(checks_config)
+        self.notifications_enabled = notifications_enabled
+        self.webhook_url = webhook_url
+        self.global_webhooks = global_webhooks or []
+        self._index_checks()
+        
+        self.last_check_results = [None] * len(self.checks)
+        self._init_unknown_state()
+
+    def _index_checks(self):
+        """Gruppiert die RAVENNA-relevanten Checks nach Typ"""
+        self.ptp_checks = [c for c in self.checks if c.type == "ptp"]
+        self.rtp_checks = [c for c in self.checks if c.type == "rtp"]
+        self.multicast_checks = [c for c in self.checks if c.type == "multicast"]
+        self.has_ptp = bool(self.ptp_checks)
+        self.has_rtp = bool(self.rtp_checks)
+        self.has_multicast = bool(self.multicast_checks)
+
     def _init_unknown_state(self):
         """Initialisiert die Check-Ergebnisse mit 'unknown'"""
-        for check in self.checks:
-            check_data = {
-                "type": check.type,
+        for i, check in enumerate(self.checks):
+            self.last_check_results[i] = {
+                **check._static_meta,
                 "status": "unknown",
                 "response_time": None,
                 "error": None,
                 "details": "Warte auf ersten Check...",
                 "timestamp": None
             }
-             # Config-Details hinzufügen
-            if check.type == "ping":
-                check_data["target"] = check.config.get("target")
-            elif check.type == "port":
-                check_data["host"] = check.config.get("host")
-                check_data["port"] = check.config.get("port")
-            
-            self.last_check_results.append(check_data)
     
     def _create_checks(self, checks_config: List[Dict[str, Any]]) -> List[BaseCheck]:
         """Erstellt Check-Objekte basierend auf Konfiguration"""
         checks = []
+        unknown_types: Counter = Counter()
+        invalid: List[str] = []
         
         for check_config in checks_config:
             check_type = check_config.get("type", "").lower()
             
-            if check_type == "ping":
-                checks.append(PingCheck(check_config))
-            elif check_type == "http":
-                checks.append(HttpCheck(check_config))
-            elif check_type == "port":
-                checks.append(PortCheck(check_config))
-            elif check_type == "ptp":
-                checks.append(PTPCheck(check_config))
-            elif check_type == "multicast":
-                checks.append(MulticastCheck(check_config))
-            elif check_type == "rtp":
-                checks.append(RTPStreamCheck(check_config))
-            elif check_type == "qos":
-                checks.append(QoSCheck(check_config))
-            elif check_type == "ravenna":
-                checks.append(RAVENNAServiceCheck(check_config))
-            else:
-                logger.warning(f"Unbekannter Check-Typ: {check_type}")
+            # Pflichtfelder werden von den Check-Konstruktoren geprüft (ValueError)
+            try:
+                if check_type == "ping":
+                    checks.append(PingCheck(check_config))
+                elif check_type == "http":
+                    checks.append(HttpCheck(check_config, self.http_client))
+                elif check_type == "port":
+                    checks.append(PortCheck(check_config, self.dns_cache))
+                elif check_type == "ptp":
+                    checks.append(PTPCheck(check_config))
+                elif check_type == "multicast":
+                    checks.append(MulticastCheck(check_config, self.dns_cache))
+                elif check_type == "rtp":
+                    checks.append(RTPStreamCheck(check_config))
+                elif check_type == "qos":
+                    checks.append(QoSCheck(check_config))
+                elif check_type == "ravenna":
+                    checks.append(RAVENNAServiceCheck(check_config, self.http_client, self.dns_cache))
+                else:
+                    unknown_types[check_type] += 1
+            except ValueError as e:
+                invalid.append(f"{check_type}: {e}")
+        
+        # Konfigurationsfehler gesammelt statt einzeln loggen
+        if unknown_types:
+            logger.warning(f"Unbekannte Check-Typen für {self.name}: {dict(unknown_types)}")
+        if invalid:
+            logger.warning(f"Ungültige Checks für {self.name} übersprungen: {'; '.join(invalid)}")
+        
+        # Unveränderliche Felder für das Frontend einmalig vorbereiten
+        for check in checks:
+            meta = {"type": check.type}
+            if check.type == "ping":
+                meta["target"] = check.config.get("target")
+            elif check.type == "port":
+                meta["host"] = check.config.get("host")
+                meta["port"] = check.config.get("port")
+            check._static_meta = meta
         
         return checks
     
-    async def run_checks(self, tags: Optional[List[str]] = None) -> Dict[str, Any]:
+    async def _run_check(self, check: BaseCheck) -> CheckResult:
+        """Führt einen Check mit Zeitlimit aus, sobald ein Platz im Semaphor frei ist"""
+        timeout = check.config.get("timeout", self.check_timeout)
+        if self.semaphore is None:
+            return await asyncio.wait_for(check.execute(), timeout=timeout)
+        
+        # Checks mit Ergebnis aus dem Sammel-Ping belegen beim Warten keinen Platz im Semaphor,
+        # die ICMP-Sockets begrenzt _multiping
+        if isinstance(check, (PingCheck, QoSCheck)) and check.result_future is not None:
+            return await asyncio.wait_for(check.execute(), timeout=timeout)
+        
+        # Wartezeit auf den Semaphor zählt nicht zum Zeitlimit des Checks
+        async with self.semaphore:
+            return await asyncio.wait_for(check.execute(), timeout=timeout)
+    
+    async def run_checks(self, tags: Optional[List[str]] = None, now: Optional[datetime] = None) -> Dict[str, Any]:
         """Führt Checks für dieses Gerät aus
         
         Args:
             tags: Optional Filter. Wenn gesetzt, werden nur Checks ausgeführt, 
                   die mindestens einen dieser Tags haben.
+            now: Zeitpunkt des Check-Zyklus (UTC), Standard ist die aktuelle Zeit
         """
-        results = []
+        failed_checks = []
+        successful_checks = []
+        errors = []
         overall_status = CheckStatus.UP
         
         # Zu prüfende Checks filtern
@@ -537,26 +774,29 @@ class DeviceMonitor:
             tag_set = set(tags)
             checks_to_run = [c for c in self.checks if not c.tags.isdisjoint(tag_set)]
         
+        # Ohne Checks (keine passenden Tags oder keine gültigen Checks) Status nicht ändern,
+        # das Ergebnis behält aber dieselbe Form für monitoring_loop
+        if not checks_to_run:
+            overall_status = self.status
+        
         # Checks parallel ausführen
-        check_tasks = [check.execute() for check in checks_to_run]
-        # Wenn keine Checks ausgewählt wurden (z.B. keine passenden Tags), leeres Ergebnis zurückgeben
-        if not check_tasks:
-            return {
-                "name": self.name,
-                "status": self.status, # Status nicht ändern
-                "checks": [],
-                "filtered_execution": True
-            }
+        check_tasks = [self._run_check(check) for check in checks_to_run]
 
+        # Ungefilterte Läufe schreiben direkt in den Puffer der letzten Ergebnisse
+        # (z.B. für initial_status), gefilterte in eine eigene Liste
+        results = self.last_check_results if tags is None else [None] * len(checks_to_run)
+        
         check_results = await asyncio.gather(*check_tasks, return_exceptions=True)
         
-        for check, result in zip(checks_to_run, check_results):
-            if isinstance(result, Exception):
+        for i, (check, result) in enumerate(zip(checks_to_run, check_results)):
+            if isinstance(result, asyncio.TimeoutError):
+                result = CheckResult(CheckStatus.DOWN, error=_ERR_CHECK_TIMEOUT)
+            elif isinstance(result, Exception):
                 logger.error(f"Check-Fehler für {self.name}: {result}")
                 result = CheckResult(CheckStatus.DOWN, error=str(result))
             
             check_data = {
-                "type": check.type,
+                **check._static_meta,
                 "status": result.status,
                 "response_time": result.response_time,
                 "error": result.error,
@@ -564,31 +804,23 @@ class DeviceMonitor:
                 "timestamp": result.timestamp.isoformat()
             }
             
-            # Wichtige Config-Details für Frontend hinzufügen
-            if check.type == "ping":
-                check_data["target"] = check.config.get("target")
-            elif check.type == "port":
-                check_data["host"] = check.config.get("host")
-                check_data["port"] = check.config.get("port")
-            
-                check_data["port"] = check.config.get("port")
-            
-            results.append(check_data)
-        
-        # Ergebnisse speichern für spätere Abfragen (z.B. initial_status)
-        if tags is None:
-            self.last_check_results = results
+            results[i] = check_data
             
+            # Zusammenfassung für Benachrichtigungen
             # Wenn ein Check fehlschlägt, ist das Gerät down
             if result.status == CheckStatus.DOWN:
                 overall_status = CheckStatus.DOWN
+                failed_checks.append(check.type)
+                errors.append(f"{check.type}: {result.error}")
+            elif result.status == CheckStatus.UP:
+                successful_checks.append(check.type)
         
         # Status aktualisieren NUR wenn keine Tags gefiltert wurden
         # (Teilweise Checks sollten den Gesamtstatus nicht überschreiben)
         if tags is None:
             previous_status = self.status
             self.status = overall_status
-            self.last_check_time = datetime.now()
+            self.last_check_time = now or datetime.now(timezone.utc)
             
             # Fehler-Zähler aktualisieren
             if overall_status == CheckStatus.DOWN:
@@ -607,7 +839,10 @@ class DeviceMonitor:
             "notifications_enabled": self.notifications_enabled,
             "global_webhooks": self.global_webhooks,
             "webhook_url": self.webhook_url,
-            "checks": results
+            "checks": results,
+            "failed_checks": failed_checks,
+            "successful_checks": successful_checks,
+            "error_msg": "; ".join(errors)
         }
         
     def get_current_state(self) -> Dict[str, Any]:
@@ -625,11 +860,57 @@ class DeviceMonitor:
         }
 
 
+async def _run_device(device: "DeviceMonitor", **kwargs) -> Optional[Dict[str, Any]]:
+    """Führt die Checks eines Geräts aus; Fehler werden hier abgefangen, damit die
+    TaskGroup nicht die Checks der übrigen Geräte abbricht"""
+    try:
+        return await device.run_checks(**kwargs)
+    except Exception as e:
+        logger.error(f"Fehler beim Ausführen der Checks für {device.name}: {e!r}")
+        return None
+
+
+def _finished_results(tasks: List[asyncio.Task]) -> List[Dict[str, Any]]:
+    """Ergebnisse der erfolgreich beendeten Tasks (bei Abbruch der TaskGroup nur ein Teil)"""
+    results = []
+    for t in tasks:
+        if t.done() and not t.cancelled() and t.exception() is None and t.result() is not None:
+            results.append(t.result())
+    return results
+
+
 class MonitoringEngine:
     """Haupt-Monitoring-Engine"""
     
-    def __init__(self, devices_config: List[Dict[str, Any]]):
+    def __init__(self, devices_config: List[Dict[str, Any]], default_check_timeout: float = 10.0, max_concurrency: int = 64):
+        self.default_check_timeout = default_check_timeout
+        self.max_concurrency = max_concurrency
+        # Maximal gleichzeitig laufende Checks über alle Geräte (schont FDs/Ports/NIC)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
         self.devices: Dict[str, DeviceMonitor] = {}
+        # Indizes der Geräte mit RAVENNA-Checks (Name -> DeviceMonitor)
+        self.ravenna_devices: Dict[str, DeviceMonitor] = {}
+        self.ptp_devices: Dict[str, DeviceMonitor] = {}
+        self.rtp_devices: Dict[str, DeviceMonitor] = {}
+        self.multicast_devices: Dict[str, DeviceMonitor] = {}
+        self.stream_devices: Dict[str, DeviceMonitor] = {}
+        # Ergebnisse des letzten vollständigen Check-Zyklus (None = ungültig/noch keiner)
+        self.latest_results: Optional[List[Dict[str, Any]]] = None
+        self.latest_tick_time: Optional[str] = None
+        # Wird bei jeder Änderung der Geräteliste erhöht
+        self.devices_gen = 0
+        # Gemeinsamer HTTP-Client für alle HTTP-/RAVENNA-Checks (Verbindungen bleiben offen)
+        self.http_client = httpx.AsyncClient(
+            timeout=10.0,
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=100, max_connections=200)
+        )
+        # Gemeinsamer DNS-Cache für Port-, Multicast- und RAVENNA-Checks
+        self.dns_cache = DNSCache()
+        
+        failed_devices: List[str] = []
+        invalid_configs = 0
         
         for device_config in devices_config:
             name = device_config.get("name")
@@ -642,31 +923,139 @@ class MonitoringEngine:
                     webhook_url = device_config.get("webhook_url", None)
                     global_webhooks = device_config.get("global_webhooks", [])
                     
-                    device_monitor = DeviceMonitor(
+                    device_monitor = self.create_device(
                         name=device_config["name"],
                         checks_config=device_config.get("checks", []),
                         notifications_enabled=notifications_enabled,
                         webhook_url=webhook_url,
                         global_webhooks=global_webhooks
                     )
-                    self.devices[device_monitor.name] = device_monitor
+                    self.add_device(device_monitor)
                 except Exception as e:
-                    logger.error(f"Fehler beim Initialisieren des Geräts '{name}': {e}")
+                    failed_devices.append(f"'{name}': {e}")
             else:
-                logger.warning(f"Ungültige Gerätekonfiguration: {device_config}")
+                invalid_configs += 1
+        
+        if failed_devices:
+            logger.error(f"Fehler beim Initialisieren von {len(failed_devices)} Geräten: {'; '.join(failed_devices)}")
+        if invalid_configs:
+            logger.warning(f"{invalid_configs} ungültige Gerätekonfigurationen übersprungen (Name oder Checks fehlen)")
         
         logger.info(f"Monitoring Engine initialisiert mit {len(self.devices)} Geräten")
     
-    async def check_all_devices(self) -> List[Dict[str, Any]]:
-        """Führt Checks für alle Geräte aus"""
-        tasks = [device.run_checks() for device in self.devices.values()]
-        results = await asyncio.gather(*tasks)
-        return results
+    def create_device(self, name: str, checks_config: List[Dict[str, Any]], notifications_enabled: bool = True, webhook_url: Optional[str] = None, global_webhooks: List[str] = None) -> DeviceMonitor:
+        """Erstellt einen DeviceMonitor, der die gemeinsamen Ressourcen der Engine nutzt"""
+        return DeviceMonitor(
+            name,
+            checks_config,
+            notifications_enabled,
+            webhook_url,
+            global_webhooks,
+            http_client=self.http_client,
+            dns_cache=self.dns_cache,
+            check_timeout=self.default_check_timeout,
+            semaphore=self.semaphore
+        )
+    
+    async def aclose(self):
+        """Gibt die gemeinsamen Ressourcen der Engine frei"""
+        await self.http_client.aclose()
+    
+    def add_device(self, device: DeviceMonitor):
+        """Registriert ein Gerät bzw. aktualisiert seine Einträge in den RAVENNA-Indizes"""
+        self.devices[device.name] = device
+        self.devices_gen += 1
+        self.latest_results = None
+        
+        indexes = (
+            (self.ravenna_devices, device.has_ptp or device.has_rtp or device.has_multicast),
+            (self.ptp_devices, device.has_ptp),
+            (self.rtp_devices, device.has_rtp),
+            (self.multicast_devices, device.has_multicast),
+            (self.stream_devices, device.has_rtp or device.has_multicast),
+        )
+        for index, member in indexes:
+            if member:
+                index[device.name] = device
+            else:
+                index.pop(device.name, None)
+    
+    def remove_device(self, device_name: str) -> Optional[DeviceMonitor]:
+        """Entfernt ein Gerät inklusive seiner Index-Einträge"""
+        for index in (self.ravenna_devices, self.ptp_devices, self.rtp_devices,
+                      self.multicast_devices, self.stream_devices):
+            index.pop(device_name, None)
+        self.devices_gen += 1
+        self.latest_results = None
+        return self.devices.pop(device_name, None)
+    
+    def rename_device(self, old_name: str, new_name: str):
+        """Benennt ein Gerät um, ohne seinen Laufzeit-Status zu verlieren"""
+        device = self.remove_device(old_name)
+        device.name = new_name
+        self.add_device(device)
+    
+    async def check_all_devices(self, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Führt Checks für alle Geräte aus
+        
+        Args:
+            now: Zeitpunkt des Check-Zyklus (UTC), wird als last_check_time übernommen
+        """
+        devices = list(self.devices.values())
+        
+        # Alle ICMP-Ziele des Zyklus sammeln und gemeinsam (begrenzt parallel) anpingen
+        loop = asyncio.get_running_loop()
+        pending: List[Tuple[str, asyncio.Future]] = []
+        if _icmp_sockets_allowed:
+            for device in devices:
+                for check in device.checks:
+                    if isinstance(check, (PingCheck, QoSCheck)) and check.icmp_target:
+                        check.result_future = loop.create_future()
+                        pending.append((check.icmp_target, check.result_future))
+        
+        tasks: List[asyncio.Task] = []
+        try:
+            async with asyncio.TaskGroup() as tg:
+                if pending:
+                    tg.create_task(self._multiping(pending))
+                tasks = [tg.create_task(_run_device(device, now=now)) for device in devices]
+        except* Exception as eg:
+            for exc in eg.exceptions:
+                logger.error(f"Fehler im Check-Zyklus: {exc!r}")
+        
+        return _finished_results(tasks)
+    
+    async def _multiping(self, pending: List[Tuple[str, asyncio.Future]]):
+        """Pingt alle gesammelten Ziele und löst jedes Future auf, sobald sein eigenes
+        Ziel fertig ist - ein toter Host verzögert nicht die Ergebnisse der übrigen"""
+        # Eigene Obergrenze für offene ICMP-Sockets (die Checks warten außerhalb des Engine-Semaphors)
+        ping_semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def ping_one(target: str, future: asyncio.Future):
+            try:
+                async with ping_semaphore:
+                    host = await _icmp_ping(target)
+            except Exception as e:
+                # z.B. ein nicht auflösbarer Name - nur dieses Ziel schlägt fehl
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(host)
+        
+        await asyncio.gather(*(ping_one(target, future) for target, future in pending))
 
     async def run_troubleshooting(self, check_tags: List[str]) -> Dict[str, Any]:
         """Führt spezifische Troubleshooting-Checks aus basierend auf Tags"""
-        tasks = [device.run_checks(tags=check_tags) for device in self.devices.values()]
-        results = await asyncio.gather(*tasks)
+        tasks: List[asyncio.Task] = []
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(_run_device(device, tags=check_tags)) for device in self.devices.values()]
+        except* Exception as eg:
+            for exc in eg.exceptions:
+                logger.error(f"Fehler beim Troubleshooting: {exc!r}")
+        
+        results = _finished_results(tasks)
         
         # Ergebnisse filtern - nur Geräte zurückgeben, die tatsächlich Checks ausgeführt haben
         relevant_results = []
@@ -675,7 +1064,7 @@ class MonitoringEngine:
                 relevant_results.append(res)
                 
         return {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
             "tags": check_tags,
             "devices": relevant_results
         }
@@ -3,31 +3,243 @@ Microsoft Teams Benachrichtigungs-Modul
 Sendet formatierte Adaptive Cards an Teams Channel
 """
 
-import aiohttp
+import asyncio
+import json
 import logging
+import random
+import time
 from datetime import datetime
-from typing import Optional
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
 
 logger = logging.getLogger(__name__)
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+# Maximal geloggte Bytes eines Fehler-Bodys
+_MAX_ERROR_BODY = 512
+
+# Meldungen pro Sammel-Card: ca. 500 Bytes je Meldung, Teams lehnt Webhook-Nachrichten
+# über ~28 KB dauerhaft (4xx) ab
+_MAX_EVENTS_PER_CARD = 20
+
+# HTTP-Status, bei denen ein erneuter Versuch sinnvoll ist (Timeout, Rate-Limit, Server-Fehler)
+_TRANSIENT_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+
+# Farbe der Statuszeile
+_STATUS_COLOR = {
+    "DOWN": "Attention",  # Rot
+    "UP": "Good",         # Grün
+    "WARNING": "Warning"  # Gelb
+}
+
+# Feste Meldungstexte (Texte mit Gerätenamen bleiben f-Strings - schneller als str.format)
+_UP_DETAILS = "The device is responding normally again."
+_TEST_MESSAGE = "🧪 This is a test notification"
+_TEST_DETAILS = "If you see this message, the webhook integration is working!"
+
+# Feste Bestandteile der Adaptive Card (werden nie verändert, nur referenziert)
+_HEADER_BLOCK = {
+    "type": "TextBlock",
+    "text": "🔔 Network Monitor Alert",
+    "weight": "Bolder",
+    "size": "Large"
+}
+_CARD_CONTENT_TYPE = "application/vnd.microsoft.card.adaptive"
+_CARD_SCHEMA = "http://adaptivecards.io/schemas/adaptive-card.json"
+
+
+def _build_card(body: list) -> dict:
+    """Verpackt den Card-Body in die Teams-Nachricht"""
+    return {
+        "type": "message",
+        "attachments": [
+            {
+                "contentType": _CARD_CONTENT_TYPE,
+                "content": {
+                    "$schema": _CARD_SCHEMA,
+                    "type": "AdaptiveCard",
+                    "version": "1.4",
+                    "body": body
+                }
+            }
+        ]
+    }
+
+
+# Formatierte Uhrzeit der aktuellen Sekunde (Sekunde, Text) - Meldungen derselben Sekunde teilen sie
+_ts_cache: Tuple[int, str] = (0, "")
+
+
+def _format_now() -> str:
+    """Aktuelle lokale Zeit als 'YYYY-MM-DD HH:MM:SS', höchstens einmal pro Sekunde formatiert"""
+    global _ts_cache
+    sec = int(time.time())
+    if _ts_cache[0] != sec:
+        _ts_cache = (sec, datetime.fromtimestamp(sec).strftime("%Y-%m-%d %H:%M:%S"))
+    return _ts_cache[1]
+
+
+def _event_blocks(event: dict, suppression_window: float) -> list:
+    """Card-Elemente für eine einzelne Meldung (Fakten, Nachricht, Details)"""
+    blocks = [
+        {
+            "type": "FactSet",
+            "facts": [
+                {"title": "Device:", "value": event["device_name"]},
+                {"title": "Status:", "value": event["status"]},
+                {"title": "Check Type:", "value": event["check_type"].upper()},
+                {"title": "Time:", "value": event["time"]}
+            ]
+        },
+        {
+            "type": "TextBlock",
+            "text": event["message"],
+            "wrap": True,
+            "weight": "Bolder",
+            "color": _STATUS_COLOR.get(event["status"], "Default")
+        }
+    ]
+    
+    # Details hinzufügen falls vorhanden
+    if event["details"]:
+        blocks.append({
+            "type": "TextBlock",
+            "text": event["details"],
+            "wrap": True,
+            "isSubtle": True
+        })
+    
+    # Hinweis auf zwischenzeitlich unterdrückte Duplikate
+    if event["suppressed"]:
+        blocks.append({
+            "type": "TextBlock",
+            "text": f"{event['suppressed']} suppressed duplicate(s) in the last {suppression_window:.0f}s",
+            "wrap": True,
+            "isSubtle": True
+        })
+    return blocks
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Liest einen Retry-After-Header in Sekunden (HTTP-Datumsangaben werden ignoriert)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
 
 class TeamsNotifier:
     """Verwaltet Microsoft Teams Benachrichtigungen"""
     
-    def __init__(self, webhook_url: str):
+    def __init__(
+        self,
+        webhook_url: str,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        jitter: float = 0.5,
+        suppression_window: float = 300.0,
+        consolidation_delay: float = 10.0,
+        max_concurrent: int = 5,
+        queue_size: int = 1000,
+        cb_threshold: int = 5,
+        cb_cooldown: float = 60.0
+    ):
         self.webhook_url = webhook_url
         self.enabled = bool(webhook_url and not webhook_url.startswith("https://your-"))
         
+        # Wiederholungen bei vorübergehenden Fehlern (exponentielles Backoff mit Jitter)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        
+        # Unterdrückung doppelter Meldungen: (Gerät, Check, Status) -> (Zeitpunkt, Anzahl unterdrückt)
+        self.suppression_window = suppression_window
+        self._dedup: Dict[Tuple[str, str, str], Tuple[float, int]] = {}
+        # Zuletzt gemeldeter Status pro Gerät - nur dessen Wiederholungen werden unterdrückt,
+        # damit nach einer UP-Meldung ein erneutes DOWN immer ankommt
+        self._last_status: Dict[str, str] = {}
+        self._last_evict = time.monotonic()
+        
+        # Meldungen landen in einer Queue; ein Worker sammelt sie consolidation_delay
+        # Sekunden lang und sendet sie als eine Card (Worker startet beim ersten Alert)
+        self.consolidation_delay = consolidation_delay
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._worker: Optional[asyncio.Task] = None
+        self._flush_now = asyncio.Event()
+        # Meldungen, die der Worker gerade sendet (für das Log beim Schließen)
+        self._in_flight = 0
+        
+        # Circuit Breaker: nach cb_threshold Fehlschlägen in Folge wird cb_cooldown
+        # Sekunden lang nichts gesendet
+        self._cb_threshold = cb_threshold
+        self._cb_cooldown = cb_cooldown
+        self._cb_failures = 0
+        self._cb_open_until = 0.0
+        
+        # Eine Session pro Notifier, damit Verbindungen (TLS) wiederverwendet werden
+        self._session: Optional[ClientSession] = None
+        self._session_lock = asyncio.Lock()
+        # Begrenzt gleichzeitig laufende POSTs (weitere Aufrufer warten)
+        self._send_semaphore = asyncio.Semaphore(max_concurrent)
+        
         if not self.enabled:
             logger.warning("Teams Webhook URL nicht konfiguriert - Benachrichtigungen deaktiviert")
     
+    async def _get_session(self) -> ClientSession:
+        """Erstellt die gemeinsame ClientSession beim ersten Aufruf"""
+        async with self._session_lock:
+            if self._session is None or self._session.closed:
+                self._session = ClientSession(
+                    connector=TCPConnector(
+                        limit=20,
+                        limit_per_host=10,
+                        ttl_dns_cache=300,
+                        keepalive_timeout=60
+                    ),
+                    timeout=ClientTimeout(total=10)
+                )
+            return self._session
+    
+    async def close(self, timeout: float = 5.0):
+        """Sendet gesammelte Meldungen (höchstens timeout Sekunden lang) und schließt
+        die ClientSession (beim Herunterfahren bzw. Verwerfen des Notifiers)"""
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except asyncio.TimeoutError:
+            dropped = self._queue.qsize() + self._in_flight
+            logger.warning(f"Teams Webhook antwortet nicht - {dropped} Meldung(en) beim Schließen verworfen")
+        if self._worker is not None:
+            self._worker.cancel()
+            # Abbruch abwarten, damit kein Request mehr auf der Session läuft
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
     async def send_alert(
         self,
         device_name: str,
         check_type: str,
         status: str,
         message: str,
-        details: Optional[str] = None
+        details: Optional[str] = None,
+        dedup: bool = True,
+        consolidate: bool = True
     ) -> bool:
         """
         Sendet eine Benachrichtigung an Teams
@@ -38,104 +250,223 @@ class TeamsNotifier:
             status: Status (DOWN, UP, WARNING)
             message: Hauptnachricht
             details: Zusätzliche Details (optional)
+            dedup: Identische Meldungen innerhalb des Unterdrückungsfensters verwerfen
+            consolidate: Meldung sammeln und mit anderen zusammen senden
         
         Returns:
-            True wenn erfolgreich gesendet, sonst False
+            True wenn erfolgreich gesendet (bzw. zum Senden vorgemerkt), sonst False
         """
         if not self.enabled:
             logger.warning(f"Benachrichtigung für {device_name} KANN NICHT gesendet werden: Webhook URL fehlt oder ungültig.")
             return False
-            
-        logger.info(f"Sende Teams Alert für {device_name} (Status: {status})...")
         
-        # Farbe basierend auf Status
-        color = {
-            "DOWN": "Attention",  # Rot
-            "UP": "Good",         # Grün
-            "WARNING": "Warning"  # Gelb
-        }.get(status, "Default")
-        
-        # Adaptive Card erstellen
-        card = {
-            "type": "message",
-            "attachments": [
-                {
-                    "contentType": "application/vnd.microsoft.card.adaptive",
-                    "content": {
-                        "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
-                        "type": "AdaptiveCard",
-                        "version": "1.4",
-                        "body": [
-                            {
-                                "type": "TextBlock",
-                                "text": f"🔔 Network Monitor Alert",
-                                "weight": "Bolder",
-                                "size": "Large"
-                            },
-                            {
-                                "type": "FactSet",
-                                "facts": [
-                                    {
-                                        "title": "Device:",
-                                        "value": device_name
-                                    },
-                                    {
-                                        "title": "Status:",
-                                        "value": status
-                                    },
-                                    {
-                                        "title": "Check Type:",
-                                        "value": check_type.upper()
-                                    },
-                                    {
-                                        "title": "Time:",
-                                        "value": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                    }
-                                ]
-                            },
-                            {
-                                "type": "TextBlock",
-                                "text": message,
-                                "wrap": True,
-                                "weight": "Bolder",
-                                "color": color
-                            }
-                        ]
-                    }
-                }
-            ]
+        suppressed = 0
+        if dedup:
+            now = time.monotonic()
+            self._evict_dedup(now)
+            key = (device_name, check_type, status)
+            entry = self._dedup.get(key)
+            if entry is not None:
+                if now - entry[0] < self.suppression_window and self._last_status.get(device_name) == status:
+                    self._dedup[key] = (entry[0], entry[1] + 1)
+                    logger.info(f"Doppelte Teams Benachrichtigung für {device_name} (Status: {status}) unterdrückt")
+                    return False
+                suppressed = entry[1]
+            self._dedup[key] = (now, 0)
+            self._last_status[device_name] = status
+        
+        if self._circuit_open():
+            logger.warning(f"Teams Circuit Breaker offen - Alert für {device_name} (Status: {status}) verworfen")
+            if dedup:
+                self._dedup.pop((device_name, check_type, status), None)
+                self._last_status.pop(device_name, None)
+            return False
+        
+        event = {
+            "device_name": device_name,
+            "check_type": check_type,
+            "status": status,
+            "message": message,
+            "details": details,
+            "suppressed": suppressed,
+            "dedup": dedup,
+            "time": _format_now()
         }
         
-        # Details hinzufügen falls vorhanden
-        if details:
-            card["attachments"][0]["content"]["body"].append({
+        if consolidate and self.consolidation_delay > 0:
+            try:
+                self._queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Lieber verwerfen als die Monitoring-Schleife zu blockieren
+                logger.error(f"Teams Queue voll - Alert für {device_name} (Status: {status}) verworfen")
+                if dedup:
+                    self._dedup.pop((device_name, check_type, status), None)
+                    self._last_status.pop(device_name, None)
+                return False
+            
+            logger.info(f"Teams Alert für {device_name} (Status: {status}) zum Senden vorgemerkt")
+            if self._worker is None or self._worker.done():
+                self._worker = asyncio.create_task(self._run_worker())
+            return True
+        
+        logger.info(f"Sende Teams Alert für {device_name} (Status: {status})...")
+        return await self._send_events([event])
+    
+    async def flush(self):
+        """Sendet alle gesammelten Meldungen sofort und wartet, bis sie verarbeitet sind"""
+        if self._worker is None or self._worker.done():
+            return
+        self._flush_now.set()
+        await self._queue.join()
+        self._flush_now.clear()
+    
+    async def _run_worker(self):
+        """Holt Meldungen aus der Queue, wartet das Sammelfenster ab und sendet
+        alle bis dahin angefallenen Meldungen gemeinsam"""
+        while True:
+            events = [await self._queue.get()]
+            try:
+                if not self._flush_now.is_set():
+                    try:
+                        await asyncio.wait_for(self._flush_now.wait(), timeout=self.consolidation_delay)
+                    except asyncio.TimeoutError:
+                        pass
+                
+                while not self._queue.empty():
+                    events.append(self._queue.get_nowait())
+                
+                # Große Bursts (z.B. Ausfall eines Racks) auf mehrere Cards verteilen
+                self._in_flight = len(events)
+                for i in range(0, len(events), _MAX_EVENTS_PER_CARD):
+                    chunk = events[i:i + _MAX_EVENTS_PER_CARD]
+                    await self._send_events(chunk)
+                    self._in_flight -= len(chunk)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Fehler im Teams Benachrichtigungs-Worker: {e}")
+            finally:
+                self._in_flight = 0
+                for _ in events:
+                    self._queue.task_done()
+    
+    async def _send_events(self, events: List[dict]) -> bool:
+        """Sendet eine oder mehrere Meldungen als eine Adaptive Card"""
+        # Adaptive Card erstellen (Kopfzeile ist ein geteiltes, unveränderliches Element)
+        if len(events) == 1:
+            event = events[0]
+            body = [_HEADER_BLOCK, *_event_blocks(event, self.suppression_window)]
+            label, status = event["device_name"], event["status"]
+        else:
+            body = [_HEADER_BLOCK, {
                 "type": "TextBlock",
-                "text": details,
+                "text": f"{len(events)} status changes",
                 "wrap": True,
                 "isSubtle": True
-            })
+            }]
+            for event in events:
+                body.append({
+                    "type": "Container",
+                    "separator": True,
+                    "items": _event_blocks(event, self.suppression_window)
+                })
+            label = ", ".join(dict.fromkeys(e["device_name"] for e in events))
+            status = "/".join(dict.fromkeys(e["status"] for e in events))
         
-        # An Teams senden
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.webhook_url,
-                    json=card,
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    response_text = await response.text()
-                    if 200 <= response.status < 300:
-                        logger.info(f"Teams Benachrichtigung erfolgreich gesendet: {device_name} - {status} (Status: {response.status})")
-                        return True
-                    else:
-                        logger.error(
-                            f"Teams Benachrichtigung fehlgeschlagen: "
-                            f"Status {response.status}, Body: {response_text}"
-                        )
-                        return False
-        except Exception as e:
-            logger.error(f"Fehler beim Senden der Teams Benachrichtigung: {e}")
-            return False
+        # An Teams senden (bei offenem Circuit Breaker ohne Netzwerkzugriff verwerfen)
+        if self._circuit_open():
+            logger.warning(f"Teams Circuit Breaker offen - Alert für {label} (Status: {status}) verworfen")
+            success = False
+        else:
+            try:
+                success = await self._post_with_retry(_build_card(body), label, status)
+            except Exception as e:
+                logger.error(f"Fehler beim Senden der Teams Benachrichtigung: {e}")
+                success = False
+            self._record_result(success)
+        
+        # Fehlgeschlagene Meldungen nicht als gesendet merken, sonst würde die nächste unterdrückt
+        if not success:
+            for event in events:
+                if event["dedup"]:
+                    self._dedup.pop((event["device_name"], event["check_type"], event["status"]), None)
+                    self._last_status.pop(event["device_name"], None)
+        return success
+    
+    def _circuit_open(self) -> bool:
+        """True, solange der Circuit Breaker nach wiederholten Fehlern offen ist"""
+        return time.monotonic() < self._cb_open_until
+    
+    def _record_result(self, success: bool):
+        """Zählt Fehlschläge in Folge und öffnet ggf. den Circuit Breaker"""
+        if success:
+            self._cb_failures = 0
+            return
+        self._cb_failures += 1
+        if self._cb_failures >= self._cb_threshold:
+            logger.error(
+                f"Teams Webhook {self._cb_failures}x in Folge fehlgeschlagen - "
+                f"Circuit Breaker für {self._cb_cooldown:.0f}s geöffnet"
+            )
+            self._cb_open_until = time.monotonic() + self._cb_cooldown
+            self._cb_failures = 0
+    
+    def _evict_dedup(self, now: float):
+        """Entfernt veraltete Dedup-Einträge (höchstens einmal pro Unterdrückungsfenster)"""
+        if now - self._last_evict < self.suppression_window:
+            return
+        self._last_evict = now
+        cutoff = now - 2 * self.suppression_window
+        self._dedup = {k: v for k, v in self._dedup.items() if v[0] >= cutoff}
+    
+    async def _post_with_retry(self, card: dict, device_name: str, status: str) -> bool:
+        """Sendet die Card und wiederholt bei 408/429/5xx, Timeouts und Verbindungsfehlern"""
+        session = await self._get_session()
+        # Einmal serialisieren, auch für Wiederholungen
+        payload = _dumps(card)
+        url = self.webhook_url
+        semaphore = self._send_semaphore
+        
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                # Semaphor nur für den Request selbst halten, nicht während des Backoffs
+                async with semaphore:
+                    async with session.post(url, data=payload, headers=_JSON_HEADERS) as response:
+                        if 200 <= response.status < 300:
+                            # Body wird nicht benötigt
+                            response.release()
+                            logger.info(f"Teams Benachrichtigung erfolgreich gesendet: {device_name} - {status} (Status: {response.status})")
+                            return True
+                        
+                        if response.status not in _TRANSIENT_STATUS:
+                            # Dauerhafter Fehler (z.B. 400/404) - erneutes Senden bringt nichts
+                            body = await response.content.read(_MAX_ERROR_BODY)
+                            logger.error(
+                                f"Teams Benachrichtigung fehlgeschlagen: "
+                                f"Status {response.status}, Body: {body.decode(errors='replace')}"
+                            )
+                            return False
+                        
+                        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                        reason = f"Status {response.status}"
+            except (ClientError, asyncio.TimeoutError) as e:
+                reason = str(e) or type(e).__name__
+            
+            if attempt == self.max_retries:
+                break
+            
+            delay = min(self.max_delay, self.base_delay * (2 ** attempt)) * (1 + random.uniform(0, self.jitter))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.max_delay))
+            logger.warning(
+                f"Teams Benachrichtigung für {device_name} fehlgeschlagen ({reason}), "
+                f"neuer Versuch in {delay:.1f}s ({attempt + 1}/{self.max_retries})"
+            )
+            await asyncio.sleep(delay)
+        
+        logger.error(f"Teams Benachrichtigung nach {self.max_retries + 1} Versuchen fehlgeschlagen: {reason}")
+        return False
     
     async def send_device_down(self, device_name: str, check_type: str, error: str):
         """Sendet Benachrichtigung für ausgefallenes Gerät"""
@@ -154,7 +485,7 @@ class TeamsNotifier:
             check_type=check_type,
             status="UP",
             message=f"✅ {device_name} is reachable again!",
-            details="The device is responding normally again."
+            details=_UP_DETAILS
         )
 
     async def send_test_notification(self, webhook_url: Optional[str] = None) -> bool:
@@ -170,8 +501,10 @@ class TeamsNotifier:
                 device_name="Test-System",
                 check_type="SYSTEM",
                 status="WARNING",
-                message="🧪 This is a test notification",
-                details="If you see this message, the webhook integration is working!"
+                message=_TEST_MESSAGE,
+                details=_TEST_DETAILS,
+                dedup=False,
+                consolidate=False
             )
         finally:
             if webhook_url:
@@ -568,6 +568,9 @@ class PortCheckerApp {
 
             if (data.type === 'checking_started') {
                 this.setLoadingState(true);
+            } else if (data.type === 'status_unchanged') {
+                // Check cycle finished without changes - keep the current data
+                this.setLoadingState(false);
             } else if (data.type === 'status_update' || data.type === 'initial_status') {
                 this.devicesData = data.devices;
                 this.setLoadingState(false);